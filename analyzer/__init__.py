@@ -0,0 +1,2 @@
+# Data Analyser helpers by Tawseef Ahmad
+# Plain pandas code used by app.py; nothing in this package imports streamlit.
@@ -0,0 +1,112 @@
+# ----------------------------
+# Headless batch runner: apply a saved recipe to many files
+# ----------------------------
+# A recipe is the JSON written by "Download plan" in the app:
+#   {"steps": [{"op": "replace", "mapping": [[-1, null]]}, {"op": "dropna", "axis": 0}, ...]}
+#
+#   python -m analyzer.batch recipe.json data/*.csv --out-dir cleaned --format parquet --workers 8
+#
+# Each input is processed in a worker process; results are written as soon as
+# they finish and one JSON line per file is printed to stdout.
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from analyzer.engine import Plan
+from analyzer.export import FORMATS, write_export
+from analyzer.ingest import load_path
+
+
+def run_file(steps, path, out, fmt):
+    started = time.perf_counter()
+    try:
+        df = Plan(steps).execute(load_path(path))
+        write_export(df, fmt, out)
+        return {"file": path, "output": out, "rows": len(df), "columns": df.shape[1],
+                "seconds": round(time.perf_counter() - started, 3), "error": None}
+    except Exception as e:
+        return {"file": path, "output": None, "rows": None, "columns": None,
+                "seconds": round(time.perf_counter() - started, 3), "error": f"{type(e).__name__}: {e}"}
+
+
+def expand_inputs(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(matches)
+    # the same file matched twice is processed once
+    unique = {}
+    for path in paths:
+        unique.setdefault(os.path.abspath(path), path)
+    return list(unique.values())
+
+
+def output_names(paths, fmt):
+    """One distinct output file name per input.
+
+    Inputs are named after their file stem; stems that collide (d1/day.csv,
+    d2/day.csv) are named after their path below the inputs' common folder
+    instead (d1__day, d2__day).
+    """
+    stems = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+    counts = {}
+    for stem in stems:
+        counts[stem.lower()] = counts.get(stem.lower(), 0) + 1
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths]) if paths else ""
+    names, taken = [], set()
+    for path, stem in zip(paths, stems):
+        if counts[stem.lower()] > 1:
+            rel = os.path.splitext(os.path.relpath(os.path.abspath(path), root))[0]
+            stem = rel.replace(os.sep, "__").replace("/", "__")
+        name, n = stem, 1
+        while name.lower() in taken:          # still clashing (e.g. case-only differences)
+            n += 1
+            name = f"{stem}-{n}"
+        taken.add(name.lower())
+        names.append(f"{name}.{FORMATS[fmt][0]}")
+    return names
+
+
+def run_batch(recipe: Plan, paths, out_dir, fmt="csv", workers=None):
+    """Run the recipe over every path; yields one report dict per file as it completes."""
+    os.makedirs(out_dir, exist_ok=True)
+    outs = [os.path.join(out_dir, name) for name in output_names(paths, fmt)]
+    if workers == 1 or len(paths) <= 1:
+        for path, out in zip(paths, outs):
+            yield run_file(recipe.steps, path, out, fmt)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_file, recipe.steps, p, out, fmt) for p, out in zip(paths, outs)]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m analyzer.batch",
+                                     description="Apply a saved Data Analyzer recipe to many files.")
+    parser.add_argument("recipe", help="recipe / plan JSON downloaded from the app")
+    parser.add_argument("inputs", nargs="+", help="input files or glob patterns (.csv/.xlsx/.xls/.json)")
+    parser.add_argument("--out-dir", default="output", help="directory for results (default: output)")
+    parser.add_argument("--format", default="csv", choices=sorted(FORMATS), help="output format")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    with open(args.recipe, encoding="utf-8") as fh:
+        recipe = Plan.from_json(fh.read())
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        parser.error("no input files matched")
+
+    failed = 0
+    for report in run_batch(recipe, paths, args.out_dir, args.format, args.workers):
+        failed += report["error"] is not None
+        print(json.dumps(report), flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
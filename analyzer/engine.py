@@ -0,0 +1,312 @@
+# ----------------------------
+# Tab operations as plain data + lazy operation plan
+# ----------------------------
+# An op is a JSON-friendly dict, e.g. {"op": "sort", "by": "price", "ascending": False}.
+import json
+
+import numpy as np
+import pandas as pd
+
+from analyzer.optimize import optimize_frame
+from analyzer.replace import cast_like, dedupe_mapping, replace_values, set_positions, value_kind, with_categories
+
+# ops whose output row i depends only on input row i (a row slice can run before them)
+ROW_LOCAL = {"replace", "fillna"}
+
+
+def _replace(df, op):
+    return replace_values(df, op["mapping"], op.get("columns"), op.get("regex", False),
+                          op.get("match_types", True))
+
+
+def _sort(df, op):
+    return df.sort_values(by=op["by"], ascending=op.get("ascending", True))
+
+
+def _slice(df, op):
+    return df.iloc[op.get("start", 0):op.get("stop")]
+
+
+def _fillna(df, op):
+    # categorical columns need the fill value as a category first
+    value = op["value"]
+    out = df
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype) and s.hasnans:
+            if out is df:
+                out = df.copy(deep=False)
+            out[col] = with_categories(s, [value])
+    return out.fillna(value)
+
+
+def stat_value(df: pd.DataFrame, column, stat: str):
+    if stat == "mean":
+        return df[column].mean()
+    if stat == "sum":
+        return df[column].sum()
+    raise ValueError(f"Unknown fill statistic: {stat}")
+
+
+def _fill_stat(df, op):
+    # "value" may be filled in by a caller that already knows the statistic
+    value = op["value"] if "value" in op else stat_value(df, op["column"], op["stat"])
+    return df.fillna({op["column"]: value})
+
+
+def _interpolate(df, op):
+    out = df.copy(deep=False)
+    out[op["column"]] = out[op["column"]].interpolate()
+    return out
+
+
+def _dropna(df, op):
+    thresh = op.get("thresh")
+    if thresh is None:
+        return df.dropna(axis=op.get("axis", 0))
+    return df.dropna(axis=op.get("axis", 0), thresh=int(thresh))
+
+
+def _edit(df, op):
+    # cell/row diff: only the touched columns are copied, the rest stay shared
+    out = df.copy(deep=False)
+    by_col = {}
+    for pos, col, value in op.get("cells", []):
+        by_col.setdefault(col, ([], []))
+        by_col[col][0].append(int(pos))
+        by_col[col][1].append(value)
+    for col, (positions, values) in by_col.items():
+        out[col] = set_positions(out[col], positions, values)
+    if op.get("drop_rows"):
+        keep = np.ones(len(out), dtype=bool)
+        keep[np.asarray(op["drop_rows"], dtype=np.int64)] = False
+        out = out[keep]
+    if op.get("add_rows"):
+        added = pd.DataFrame(op["add_rows"], columns=out.columns)
+        # keep the frame's dtypes (int8, categories, Arrow strings) instead of concat's object/int64
+        for i in range(out.shape[1]):
+            column, values = cast_like(out.iloc[:, i], added.iloc[:, i])
+            if column is not out.iloc[:, i]:
+                out.isetitem(i, column)
+            added.isetitem(i, values)
+        if pd.api.types.is_integer_dtype(df.index.dtype) and len(df):
+            first = int(df.index.max()) + 1
+            added.index = pd.RangeIndex(first, first + len(added))
+        out = pd.concat([out, added])
+    return out
+
+
+def _group(df, op):
+    from analyzer.grouping import group_aggregate
+
+    return group_aggregate(df, op["keys"], [tuple(x) for x in op["specs"]]).reset_index()
+
+
+def _pivot(df, op):
+    from analyzer.grouping import pivot
+
+    return pivot(df, op["rows"], op["column"], op["value"], op["agg"]).reset_index()
+
+
+OPS = {
+    "replace": _replace,
+    "sort": _sort,
+    "slice": _slice,
+    "fillna": _fillna,
+    "fill_stat": _fill_stat,
+    "interpolate": _interpolate,
+    "ffill": lambda df, op: df.ffill(),
+    "bfill": lambda df, op: df.bfill(),
+    "dropna": _dropna,
+    "edit": _edit,
+    "group": _group,
+    "pivot": _pivot,
+    "optimize": lambda df, op: optimize_frame(df),
+}
+
+
+def apply_op(df: pd.DataFrame, op: dict) -> pd.DataFrame:
+    try:
+        fn = OPS[op["op"]]
+    except KeyError:
+        raise ValueError(f"Unknown operation: {op.get('op')}")
+    return fn(df, op)
+
+
+def describe(op: dict) -> str:
+    kind = op["op"]
+    if kind == "replace":
+        pairs = ", ".join(f"{a!r}→{b!r}" for a, b in op["mapping"][:3])
+        more = f" (+{len(op['mapping']) - 3})" if len(op["mapping"]) > 3 else ""
+        scope = f" in {', '.join(map(str, op['columns']))}" if op.get("columns") else ""
+        return f"replace {pairs}{more}{scope}" + (" (regex)" if op.get("regex") else "")
+    if kind == "sort":
+        by, asc = op["by"], op.get("ascending", True)
+        if not isinstance(by, (list, tuple)):
+            return f"sort {by} {'asc' if asc else 'desc'}"
+        asc = asc if isinstance(asc, (list, tuple)) else [asc] * len(by)
+        return "sort " + ", ".join(f"{c} {'asc' if a else 'desc'}" for c, a in zip(by, asc))
+    if kind == "slice":
+        return f"rows {op.get('start', 0)}:{'' if op.get('stop') is None else op['stop']}"
+    if kind == "fillna":
+        return f"fill nulls with {op['value']!r}"
+    if kind == "fill_stat":
+        return f"fill {op['column']} with {op['stat']}"
+    if kind == "interpolate":
+        return f"interpolate {op['column']}"
+    if kind == "edit":
+        parts = [f"{len(op.get(k, []))} {what}" for k, what in
+                 (("cells", "cells"), ("drop_rows", "deleted rows"), ("add_rows", "added rows")) if op.get(k)]
+        return "grid edit: " + ", ".join(parts or ["no changes"])
+    if kind == "group":
+        specs = ", ".join(f"{agg}({col})" for col, agg in op["specs"])
+        return f"group by {', '.join(map(str, op['keys']))}: {specs}"
+    if kind == "pivot":
+        return f"pivot {op['agg']}({op['value']}) by {op['rows']} × {op['column']}"
+    if kind == "dropna":
+        what = "columns" if op.get("axis", 0) == 1 else "rows"
+        return f"drop null {what}" + ("" if op.get("thresh") is None else f" (thresh={op['thresh']})")
+    if kind == "optimize":
+        return "optimize memory"
+    return kind
+
+
+# ----------------------------
+# Fusion rules
+# ----------------------------
+def _match_key(value):
+    # find values replace_column treats as the same: nulls alike, 1 and 1.0 alike, True apart from 1
+    kind = value_kind(value)
+    if kind == "null":
+        return None
+    return ("number" if kind in ("int", "float") else kind, value)
+
+
+def _fusable_replaces(a, b):
+    # only strict replaces that keep each value's kind: then the column after `a` has the
+    # same dtype family, `b` matches there as it would on the input, and writing both
+    # mappings' values at once casts the column the same way as writing them in turn
+    return a["op"] == b["op"] == "replace" and not a.get("regex") and not b.get("regex") \
+        and a.get("columns") == b.get("columns") \
+        and a.get("match_types", True) and b.get("match_types", True) \
+        and all(value_kind(old) == value_kind(new) for old, new in a["mapping"] + b["mapping"])
+
+
+def _compose_replace(first, second):
+    # sequential replaces -> one simultaneous mapping with the same result
+    # (repeated find values: first pair wins, as in replace_values)
+    first, second = dedupe_mapping(first), dedupe_mapping(second)
+    out = {}
+    for a, b in first:
+        out.setdefault(_match_key(a), [a, b])
+    follow = {}
+    for a, b in second:
+        follow.setdefault(_match_key(a), b)
+    for pair in out.values():
+        key = _match_key(pair[1])
+        if key in follow:
+            pair[1] = follow[key]
+    for a, b in second:
+        out.setdefault(_match_key(a), [a, b])
+    # a -> a pairs stay: writing 1.0 over an int 1 still casts the column, as it would eagerly
+    return list(out.values())
+
+
+def _compose_slice(first, second):
+    start1, stop1 = first.get("start", 0), first.get("stop")
+    start2, stop2 = second.get("start", 0), second.get("stop")
+    start = start1 + start2
+    stop = None if stop2 is None else start1 + stop2
+    if stop1 is not None:
+        stop = stop1 if stop is None else min(stop, stop1)
+    if stop is not None:
+        stop = max(stop, start)
+    return {"op": "slice", "start": start, "stop": stop}
+
+
+def _fuse_pair(a, b):
+    """One op equivalent to a-then-b, or None."""
+    if _fusable_replaces(a, b):
+        fused = dict(a)
+        fused["mapping"] = _compose_replace(a["mapping"], b["mapping"])
+        return fused
+    if a["op"] == b["op"] == "slice":
+        return _compose_slice(a, b)
+    if a["op"] == b["op"] and a["op"] in ("ffill", "bfill"):
+        return a
+    if a == b and a["op"] == "dropna":
+        return a
+    return None
+
+
+def optimize(steps):
+    """Push row slices ahead of row-local ops and fuse neighbours until nothing changes."""
+    steps = [dict(s) for s in steps]
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(steps) - 1):
+            a, b = steps[i], steps[i + 1]
+            if b["op"] == "slice" and a["op"] in ROW_LOCAL:
+                steps[i], steps[i + 1] = b, a
+                changed = True
+                break
+            fused = _fuse_pair(a, b)
+            if fused is not None:
+                steps[i:i + 2] = [fused]
+                changed = True
+                break
+    return [s for s in steps if not (s["op"] == "replace" and not s["mapping"])]
+
+
+def run_steps(df: pd.DataFrame, steps) -> pd.DataFrame:
+    for op in steps:
+        df = apply_op(df, op)
+    return df
+
+
+class Plan:
+    """Recorded ops that only run when the data is actually needed."""
+
+    def __init__(self, steps=None):
+        self.steps = list(steps or [])
+
+    def __len__(self):
+        return len(self.steps)
+
+    def add(self, op: dict):
+        self.steps.append(dict(op))
+
+    def clear(self):
+        self.steps = []
+
+    def optimized(self):
+        return optimize(self.steps)
+
+    def execute(self, df: pd.DataFrame) -> pd.DataFrame:
+        return run_steps(df, self.optimized())
+
+    def verify(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Execute both one op at a time and optimized; raise if the results differ."""
+        eager, fused = run_steps(df, self.steps), self.execute(df)
+        try:
+            pd.testing.assert_frame_equal(eager, fused)
+        except AssertionError as e:
+            raise ValueError(f"Optimized plan differs from running its steps one by one: {e}") from None
+        return fused
+
+    def preview(self, df: pd.DataFrame, start: int = 0, stop: int = 10) -> pd.DataFrame:
+        # the trailing slice is pushed down as far as it can go, so row-local plans touch only these rows
+        return run_steps(df, optimize(self.steps + [{"op": "slice", "start": start, "stop": stop}]))
+
+    def to_json(self) -> str:
+        return json.dumps({"steps": self.steps}, indent=2, default=str)
+
+    @classmethod
+    def from_json(cls, text) -> "Plan":
+        data = json.loads(text)
+        steps = data["steps"] if isinstance(data, dict) else data
+        for op in steps:
+            if op.get("op") not in OPS:
+                raise ValueError(f"Unknown operation: {op.get('op')}")
+        return cls(steps)
@@ -0,0 +1,223 @@
+# ----------------------------
+# Chunked export writers + per-version export cache
+# ----------------------------
+import gzip
+import os
+import shutil
+import tempfile
+import uuid
+
+import pandas as pd
+
+CHUNK_ROWS = 100_000
+EXCEL_MAX_ROWS = 1_048_576
+# CSV chunks are serialized (and gzipped) in worker processes above this many rows
+PARALLEL_MIN_ROWS = 500_000
+GZIP_LEVEL = 6             # level 9 is ~3x slower for a few % smaller files
+
+# fmt -> (extension, mime, button label)
+FORMATS = {
+    "csv": ("csv", "text/csv", "💾 Download CSV"),
+    "csv.gz": ("csv.gz", "application/gzip", "🗜️ Download CSV (.gz)"),
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+             "📘 Download Excel (.xlsx)"),
+    "parquet": ("parquet", "application/octet-stream", "🧱 Download Parquet"),
+    "feather": ("feather", "application/octet-stream", "🪶 Download Feather"),
+}
+
+
+class Cancelled(Exception):
+    pass
+
+
+def iter_chunks(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS):
+    if len(df) == 0:
+        yield df
+        return
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def tracked_chunks(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS, progress=None, cancel=None):
+    """iter_chunks that reports progress(rows_done, rows_total) and stops once cancel (an Event) is set."""
+    done = 0
+    for chunk in iter_chunks(df, chunk_rows):
+        if cancel is not None and cancel.is_set():
+            raise Cancelled("Save cancelled")
+        yield chunk
+        done += len(chunk)
+        if progress is not None:
+            progress(done, len(df))
+
+
+def _csv_chunk_job(args):
+    # runs in a worker process: one chunk -> encoded CSV bytes (a complete gzip member when compressing)
+    chunk, header, compress = args
+    data = chunk.to_csv(index=False, header=header).encode("utf-8")
+    return gzip.compress(data, compresslevel=GZIP_LEVEL) if compress else data
+
+
+def _write_csv_parallel(df, path, compress, chunk_rows, workers, progress, cancel):
+    from concurrent.futures import ProcessPoolExecutor
+
+    # gzip members can simply be concatenated, so each worker compresses its own chunk;
+    # at most 2 chunks per worker are in flight to bound memory
+    done = 0
+
+    def write(item):
+        nonlocal done
+        rows, future = item
+        fh.write(future.result())
+        done += rows
+        if progress is not None:
+            progress(done, len(df))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(path, "wb") as fh:
+        pending = []
+        for i, chunk in enumerate(tracked_chunks(df, chunk_rows, cancel=cancel)):
+            pending.append((len(chunk), pool.submit(_csv_chunk_job, (chunk, i == 0, compress))))
+            if len(pending) >= 2 * workers:
+                write(pending.pop(0))
+        for item in pending:
+            write(item)
+
+
+def write_csv(df: pd.DataFrame, path: str, compress: bool = False, chunk_rows: int = CHUNK_ROWS,
+              progress=None, cancel=None, max_workers: int = None):
+    workers = max_workers if max_workers is not None else min(os.cpu_count() or 1, 8)
+    if workers > 1 and len(df) >= PARALLEL_MIN_ROWS:
+        return _write_csv_parallel(df, path, compress, chunk_rows, workers, progress, cancel)
+    if compress:
+        fh = gzip.open(path, "wt", compresslevel=GZIP_LEVEL, encoding="utf-8", newline="")
+    else:
+        fh = open(path, "w", encoding="utf-8", newline="")
+    with fh:
+        for i, chunk in enumerate(tracked_chunks(df, chunk_rows, progress, cancel)):
+            chunk.to_csv(fh, index=False, header=(i == 0))
+
+
+def _excel_rows(chunk: pd.DataFrame):
+    # NaN/NaT -> empty cell, everything else as python objects openpyxl understands
+    values = chunk.astype(object).where(chunk.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+
+def write_xlsx(df: pd.DataFrame, path: str, sheet_name: str = "Sheet1", chunk_rows: int = 10_000,
+               progress=None, cancel=None):
+    # openpyxl write-only mode streams rows to disk instead of building every cell object
+    from openpyxl import Workbook
+
+    if len(df) + 1 > EXCEL_MAX_ROWS:
+        raise ValueError(f"Excel sheets hold at most {EXCEL_MAX_ROWS - 1:,} data rows; "
+                         f"this data has {len(df):,}. Use CSV or Parquet instead.")
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append([str(c) for c in df.columns])
+    for chunk in tracked_chunks(df, chunk_rows, progress, cancel):
+        for row in _excel_rows(chunk):
+            ws.append(row)
+    wb.save(path)
+
+
+def _arrow_frame(df: pd.DataFrame, what: str):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise RuntimeError(f"{what} export needs pyarrow (pip install pyarrow).")
+
+    frame = df.copy(deep=False)
+    frame.columns = [str(c) for c in frame.columns]
+    return frame, pa.Schema.from_pandas(frame, preserve_index=False)
+
+
+def write_parquet(df: pd.DataFrame, path: str, chunk_rows: int = CHUNK_ROWS, progress=None, cancel=None,
+                  partition_cols=None):
+    """One file written chunk by chunk, or with partition_cols a directory of
+    col=value/ partitions that pyarrow writes with its own thread pool."""
+    frame, schema = _arrow_frame(df, "Parquet")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if partition_cols:
+        os.makedirs(path, exist_ok=True)
+        for chunk in tracked_chunks(frame, chunk_rows, progress, cancel):
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            pq.write_to_dataset(table, path, partition_cols=[str(c) for c in partition_cols],
+                                basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet")
+        return
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in tracked_chunks(frame, chunk_rows, progress, cancel):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def write_feather(df: pd.DataFrame, path: str, chunk_rows: int = CHUNK_ROWS, progress=None, cancel=None):
+    # Arrow IPC file (Feather v2), zstd-compressed record batches
+    frame, schema = _arrow_frame(df, "Feather")
+    import pyarrow as pa
+
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, schema, options=options) as writer:
+        for chunk in tracked_chunks(frame, chunk_rows, progress, cancel):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def write_export(df: pd.DataFrame, fmt: str, path: str, progress=None, cancel=None, **options):
+    if fmt == "csv":
+        write_csv(df, path, progress=progress, cancel=cancel, **options)
+    elif fmt == "csv.gz":
+        write_csv(df, path, compress=True, progress=progress, cancel=cancel, **options)
+    elif fmt == "xlsx":
+        write_xlsx(df, path, progress=progress, cancel=cancel, **options)
+    elif fmt == "parquet":
+        write_parquet(df, path, progress=progress, cancel=cancel, **options)
+    elif fmt == "feather":
+        write_feather(df, path, progress=progress, cancel=cancel, **options)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+class ExportCache:
+    """Built export files for one data version; anything older is deleted."""
+
+    def __init__(self):
+        self.version = None
+        self.paths = {}
+        self._dir = None
+
+    def _reset(self, version):
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+        self._dir = None
+        self.paths = {}
+        self.version = version
+
+    def get(self, version, fmt: str):
+        if version != self.version:
+            self._reset(version)
+            return None
+        return self.paths.get(fmt)
+
+    def build(self, df: pd.DataFrame, version, fmt: str) -> str:
+        path = self.get(version, fmt)
+        if path is not None:
+            return path
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix="analyzer-export-")
+        path = os.path.join(self._dir, f"export.{FORMATS[fmt][0]}")
+        try:
+            write_export(df, fmt, path)
+        except Exception:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        self.paths[fmt] = path
+        return path
+
+    def close(self):
+        self._reset(None)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -0,0 +1,44 @@
+# ----------------------------
+# Paginated grid: row window selection + editor diff -> edit op
+# ----------------------------
+import numpy as np
+import pandas as pd
+
+PAGE_SIZES = [50, 100, 250, 500, 1000]
+
+
+def view_positions(df: pd.DataFrame, filter_col=None, filter_text: str = "",
+                   sort_col=None, ascending: bool = True) -> np.ndarray:
+    """Row positions of the filtered/sorted view, computed server-side."""
+    positions = np.arange(len(df))
+    if filter_col is not None and filter_text:
+        col = df[filter_col]
+        mask = col.astype(str).str.contains(filter_text, case=False, regex=False, na=False).to_numpy()
+        positions = positions[mask]
+    if sort_col is not None:
+        # ordinal codes instead of comparisons: works for mixed-type object columns too
+        codes, uniques = pd.factorize(df[sort_col].iloc[positions], sort=True)
+        n = len(uniques)
+        ranks = np.where(codes < 0, n, codes if ascending else n - 1 - codes)   # nulls last
+        positions = positions[np.argsort(ranks, kind="stable")]
+    return positions
+
+
+def window(df: pd.DataFrame, positions: np.ndarray, page: int, page_size: int):
+    start = page * page_size
+    return df.iloc[positions[start:start + page_size]], start
+
+
+def diff_to_op(editor_state: dict, positions: np.ndarray, start: int, columns) -> dict:
+    """Turn st.data_editor's edited/added/deleted rows for a window into an engine edit op."""
+    by_name = {str(c): c for c in columns}
+    cells = []
+    for row, changes in (editor_state.get("edited_rows") or {}).items():
+        pos = int(positions[start + int(row)])
+        for name, value in changes.items():
+            if name in by_name:
+                cells.append([pos, by_name[name], value])
+    drop_rows = [int(positions[start + int(r)]) for r in editor_state.get("deleted_rows") or []]
+    add_rows = [{by_name[k]: v for k, v in row.items() if k in by_name}
+                for row in editor_state.get("added_rows") or []]
+    return {"op": "edit", "cells": cells, "drop_rows": drop_rows, "add_rows": add_rows}
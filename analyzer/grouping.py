@@ -0,0 +1,115 @@
+# ----------------------------
+# Group-by engine: cached factorized keys + multi-aggregation
+# ----------------------------
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from analyzer.store import column_ref
+
+AGGS = ["sum", "count", "mean", "min", "max", "median", "nunique"]
+MAX_CACHED_KEYS = 64
+
+
+class GroupKeyCache:
+    """Factorized codes per grouping column, so re-running with new aggregations skips hashing.
+
+    Entries are keyed by the column's memory identity when known (it changes
+    whenever the column does) and only reused while the array behind it is still
+    alive, otherwise by (data version, column).
+    """
+
+    def __init__(self):
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def codes(self, df: pd.DataFrame, col, version=None):
+        series = df[col]
+        ident, ref = column_ref(series)
+        key = ("mem", ident) if ident is not None else ("version", version, col)
+        hit = self._items.get(key)
+        # a dead ref means the address may now belong to a different column
+        if hit is not None and (ref is None or hit[2]() is not None) and len(hit[0]) == len(series):
+            self._items.move_to_end(key)
+            self.hits += 1
+            return hit[:2]
+        self.misses += 1
+        codes, uniques = pd.factorize(series, sort=True)   # NaN keys -> -1, dropped like groupby
+        hit = (codes.astype(np.int64, copy=False), uniques, ref)
+        self._items[key] = hit
+        while len(self._items) > MAX_CACHED_KEYS:
+            self._items.popitem(last=False)
+        return hit[:2]
+
+
+def group_codes(df: pd.DataFrame, keys, cache: GroupKeyCache = None, version=None):
+    """(codes, index) with one compact code per distinct key combination, -1 for rows with a null key."""
+    cache = cache or GroupKeyCache()
+    parts = [cache.codes(df, k, version) for k in keys]
+    if len(parts) == 1:
+        codes, uniques = parts[0]
+        return codes, pd.Index(uniques, name=keys[0])
+    combined = np.zeros(len(df), dtype=np.int64)
+    valid = np.ones(len(df), dtype=bool)
+    radix = 1
+    for codes, uniques in parts:
+        valid &= codes >= 0
+        size = max(len(uniques), 1)
+        if radix * size >= 2 ** 63:
+            # the mixed-radix code would overflow int64: renumber the combinations seen
+            # so far to 0..k-1 (order preserving) before adding this key
+            present, combined = np.unique(combined, return_inverse=True)
+            radix = len(present)
+        combined = combined * size + np.where(codes >= 0, codes, 0)
+        radix *= size
+    # codes are in sorted key order; compact them to 0..n-1
+    rows = np.flatnonzero(valid)
+    present, compact = np.unique(combined[rows], return_inverse=True)
+    codes = np.full(len(df), -1, dtype=np.int64)
+    codes[rows] = compact
+    # key values per group, read off any one row of that group
+    first = np.empty(len(present), dtype=np.int64)
+    first[compact] = rows
+    levels = [np.asarray(uniques)[key_codes[first]] for key_codes, uniques in parts]
+    index = pd.MultiIndex.from_arrays(levels, names=list(keys))
+    return codes, index
+
+
+def group_aggregate(df: pd.DataFrame, keys, specs, cache: GroupKeyCache = None, version=None) -> pd.DataFrame:
+    """Aggregate several value columns at once.
+
+    specs is a list of (column, agg) pairs, agg one of AGGS. Result columns
+    are named "<column>_<agg>" and indexed by the group keys.
+    """
+    keys = list(keys)
+    if not keys:
+        raise ValueError("Choose at least one grouping column.")
+    if not specs:
+        raise ValueError("Choose at least one value column and aggregation.")
+    for _, agg in specs:
+        if agg not in AGGS:
+            raise ValueError(f"Unknown aggregation: {agg}")
+    codes, index = group_codes(df, keys, cache, version)
+    # grouping by categorical codes reuses the factorization instead of hashing the keys again
+    grouper = pd.Categorical.from_codes(codes, categories=pd.RangeIndex(len(index)))
+    wanted = OrderedDict()
+    for col, agg in specs:
+        wanted.setdefault(col, [])
+        if agg not in wanted[col]:
+            wanted[col].append(agg)
+    values = pd.DataFrame({i: df[col] for i, col in enumerate(wanted)})
+    out = values.groupby(grouper, observed=True).agg({i: aggs for i, aggs in enumerate(wanted.values())})
+    names = list(wanted)
+    out.columns = [f"{names[i]}_{agg}" for i, agg in out.columns]
+    out.index = index[out.index.to_numpy(dtype=np.int64)]
+    return out
+
+
+def pivot(df: pd.DataFrame, rows, column, value, agg: str, cache: GroupKeyCache = None, version=None) -> pd.DataFrame:
+    """Pivot table: one row per `rows` combination, one column per distinct `column` value."""
+    out = group_aggregate(df, list(rows) + [column], [(value, agg)], cache, version)
+    table = out.iloc[:, 0].unstack(column)
+    table.columns.name = f"{value}_{agg} by {column}"
+    return table
@@ -0,0 +1,589 @@
+# ----------------------------
+# Upload parsing + ingest cache
+# ----------------------------
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from analyzer.store import column_key
+
+DEFAULT_BUDGET_MB = 1024
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def file_kind(name: str):
+    name = name.lower()
+    for ext in ("csv", "xlsx", "xls", "json"):
+        if name.endswith("." + ext):
+            return ext
+    return None
+
+
+def parse_bytes(data: bytes, kind: str, options=None) -> pd.DataFrame:
+    options = dict(options or {})
+    buf = io.BytesIO(data)
+    if kind == "csv":
+        return pd.read_csv(buf, **options)
+    if kind in ("xlsx", "xls"):
+        return read_excel_fast(data, kind, **options)
+    if kind == "json":
+        return pd.read_json(buf, **options)
+    raise ValueError("Unsupported file type.")
+
+
+def load_path(path: str, options=None) -> pd.DataFrame:
+    kind = file_kind(path)
+    if kind is None:
+        raise ValueError(f"Unsupported file type: {path}")
+    if kind == "csv" and not options:
+        return pd.read_csv(path)
+    with open(path, "rb") as fh:
+        return parse_bytes(fh.read(), kind, options)
+
+
+def cache_key(digest: str, kind: str, options=None):
+    # options must be hashable-ish (str/int/tuple values) to be part of the key
+    return (digest, kind, tuple(sorted((options or {}).items())))
+
+
+def spill_frame(df: pd.DataFrame, path: str) -> str:
+    """Write df as an uncompressed Arrow IPC file (memory-mappable); pickle when Arrow can't hold it."""
+    try:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=None)
+    except Exception:
+        # e.g. duplicate column names or mixed-type object columns
+        path += ".pkl"
+        df.to_pickle(path)
+        return path
+    path += ".arrow"
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return path
+
+
+def load_spilled(path: str) -> pd.DataFrame:
+    if path.endswith(".pkl"):
+        return pd.read_pickle(path)
+    import pyarrow as pa
+
+    # numeric/string columns stay backed by the mapped file (read-only, shared page cache)
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+class IngestCache:
+    """Process-wide store of parsed frames, keyed by content hash + parse options.
+
+    Every session gets its own shallow view of the one shared frame; pandas
+    copy-on-write copies only what a session later modifies. When resident
+    frames go over the budget, the least recently used ones that no session
+    still shares columns with (through a view handed out, or any version in an
+    attached DataStore) are written to memory-mapped Arrow files and dropped;
+    get() maps them back in.
+    """
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_MB * 1024 * 1024, spill_dir: str = None):
+        self.budget_bytes = int(budget_bytes)
+        self._items = OrderedDict()
+        self._sizes = {}
+        self._meta = {}
+        self._columns = {}    # key -> column_key()s of the resident frame
+        self._views = {}      # key -> {id: view} of the views handed out, weakly held
+        self._stores = weakref.WeakSet()  # session DataStores, see attach()
+        self._spilled = {}    # key -> spill file
+        self._spilling = set()
+        self._spill_dir = spill_dir
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    @property
+    def used_bytes(self) -> int:
+        with self._lock:
+            return self._used()
+
+    @property
+    def pinned_bytes(self) -> int:
+        # resident frames some session is still looking at (can't be evicted)
+        with self._lock:
+            return sum(size for key, size in self._sizes.items() if self._in_use(key))
+
+    @property
+    def spilled_count(self) -> int:
+        with self._lock:
+            return sum(1 for key in self._spilled if key not in self._items)
+
+    def attach(self, store):
+        """Count the columns a session's DataStore holds (in any version) as in use."""
+        with self._lock:
+            self._stores.add(store)
+
+    def set_budget(self, budget_bytes: int):
+        with self._lock:
+            self.budget_bytes = int(budget_bytes)
+        self._evict()
+
+    def trim(self):
+        # sessions that ended may have released frames since the last put/get
+        self._evict()
+
+    def get(self, key):
+        with self._lock:
+            df = self._items.get(key)
+            if df is None:
+                path = self._spilled.get(key)
+                if path is None:
+                    self.misses += 1
+                    return None
+                df = load_spilled(path)
+                self.reloads += 1
+                self._store(key, df)
+            self._items.move_to_end(key)
+            self.hits += 1
+            view = self._view(key, df)
+        self._evict()
+        return view
+
+    def meta(self, key) -> dict:
+        return self._meta.get(key, {})
+
+    def put(self, key, df: pd.DataFrame, meta: dict = None) -> pd.DataFrame:
+        """Store df and return the caller's view of it."""
+        with self._lock:
+            self._discard_spill(key)
+            self._store(key, df)
+            self._meta[key] = dict(meta or {}, memory_bytes=self._sizes[key])
+            self._items.move_to_end(key)
+            view = self._view(key, df)
+        self._evict()
+        return view
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._spilled):
+                self._discard_spill(key)
+            self._items.clear()
+            self._sizes.clear()
+            self._columns.clear()
+            self._meta.clear()
+            self._views.clear()
+
+    def _store(self, key, df: pd.DataFrame):
+        self._items[key] = df
+        self._sizes[key] = frame_nbytes(df)
+        self._columns[key] = {k for k in (column_key(df.iloc[:, i]) for i in range(df.shape[1]))
+                              if k is not None}
+
+    def _used(self) -> int:
+        return sum(self._sizes.values())
+
+    def _view(self, key, df: pd.DataFrame) -> pd.DataFrame:
+        view = df.copy(deep=False)
+        self._views.setdefault(key, weakref.WeakValueDictionary())[id(view)] = view
+        return view
+
+    def _in_use(self, key) -> bool:
+        if len(self._views.get(key, ())) > 0:
+            return True
+        # a session that optimized or edited the data, or whose history dropped the
+        # view, still shares the unchanged columns: spilling them would free nothing
+        columns = self._columns.get(key)
+        return bool(columns) and any(not columns.isdisjoint(store.column_keys()) for store in list(self._stores))
+
+    def _discard_spill(self, key):
+        path = self._spilled.pop(key, None)
+        if path is not None:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self):
+        # pick victims under the lock, but write the (possibly multi-GB) spill files
+        # without it so other sessions' get/put aren't blocked behind the disk
+        with self._lock:
+            over = self._used() - self.budget_bytes
+            victims = []
+            for key, df in self._items.items():
+                if over <= 0:
+                    break
+                if key in self._spilling or self._in_use(key):
+                    continue
+                victims.append((key, df, self._spilled.get(key)))
+                self._spilling.add(key)
+                over -= self._sizes[key]
+            if victims and self._spill_dir is None:
+                self._spill_dir = tempfile.mkdtemp(prefix="analyzer-datasets-")
+        for i, (key, df, path) in enumerate(victims):
+            written = None
+            try:
+                if path is None:
+                    written = path = spill_frame(df, os.path.join(self._spill_dir, content_hash(repr(key).encode())))
+            except Exception:
+                with self._lock:
+                    self._spilling.difference_update(k for k, _, _ in victims[i:])
+                raise
+            with self._lock:
+                self._spilling.discard(key)
+                # replaced, cleared or picked up by a session while the file was written
+                if self._items.get(key) is not df or self._in_use(key):
+                    if written is not None and self._spilled.get(key) != written:
+                        os.remove(written)
+                    continue
+                self._spilled[key] = path
+                del self._items[key]
+                self._sizes.pop(key, None)
+                self._columns.pop(key, None)
+
+    def load(self, data: bytes, name: str, options=None, digest: str = None):
+        """Return (key, df, from_cache) for an upload's raw bytes."""
+        kind = file_kind(name)
+        if kind is None:
+            raise ValueError("Unsupported file type.")
+        key = cache_key(digest or content_hash(data), kind, options)
+        df = self.get(key)
+        if df is not None:
+            return key, df, True
+        return key, self.put(key, parse_bytes(data, kind, options)), False
+
+
+# ----------------------------
+# Streaming CSV ingest (chunked -> on-disk Parquet parts -> compact frame)
+# ----------------------------
+STREAM_CHUNK_ROWS = 250_000
+STREAM_SAMPLE_ROWS = 50_000
+CATEGORY_MAX_RATIO = 0.5     # distinct/rows in the sample at or below this -> category
+CATEGORY_MAX_UNIQUE = 10_000
+
+
+def infer_csv_plan(sample: pd.DataFrame) -> dict:
+    """read_csv dtype overrides chosen from a sample of the file."""
+    plan = {}
+    for col in sample.columns:
+        s = sample[col]
+        if pd.api.types.is_float_dtype(s.dtype):
+            # keep later chunks from flipping between int and float
+            plan[col] = "float64"
+        elif pd.api.types.is_object_dtype(s.dtype) or pd.api.types.is_string_dtype(s.dtype):
+            n = int(s.notna().sum())
+            distinct = s.nunique(dropna=True)
+            if n and distinct <= CATEGORY_MAX_UNIQUE and distinct / n <= CATEGORY_MAX_RATIO:
+                plan[col] = "category"
+    return plan
+
+
+def downcast_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    out = {}
+    for col in chunk.columns:
+        s = chunk[col]
+        if pd.api.types.is_integer_dtype(s.dtype) and not isinstance(s.dtype, pd.CategoricalDtype):
+            s = pd.to_numeric(s, downcast="integer")
+        out[col] = s
+    return pd.DataFrame(out, index=chunk.index)
+
+
+def _unify_column_types(schemas):
+    import pyarrow as pa
+
+    fields = []
+    for i, name in enumerate(schemas[0].names):
+        types = [s.field(i).type for s in schemas]
+        try:
+            unified = pa.unify_schemas([pa.schema([(name, t)]) for t in types],
+                                       promote_options="permissive").field(0).type
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            # e.g. numbers in one chunk and text in another -> keep everything as text
+            unified = pa.string()
+        fields.append(pa.field(name, unified))
+    return pa.schema(fields)
+
+
+def _cast_table(table, schema):
+    import pyarrow as pa
+
+    cols = []
+    for i, field in enumerate(schema):
+        col = table.column(i)
+        if col.type != field.type:
+            if pa.types.is_dictionary(col.type) and not pa.types.is_dictionary(field.type):
+                col = col.cast(col.type.value_type)
+            col = col.cast(field.type)
+        cols.append(col)
+    return pa.Table.from_arrays(cols, schema=schema)
+
+
+def stream_csv(source, workdir: str, chunk_rows: int = STREAM_CHUNK_ROWS,
+               sample_rows: int = STREAM_SAMPLE_ROWS, progress=None, total_bytes: int = None):
+    """Read a CSV chunk by chunk into Parquet parts under workdir, then load them compactly.
+
+    source is a path or a seekable binary file. progress(rows, fraction) is
+    called after each chunk. Returns (df, info) where info has rows, chunks,
+    disk_bytes and memory_bytes.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    own = isinstance(source, (str, os.PathLike))
+    fh = open(source, "rb") if own else source
+    try:
+        if total_bytes is None:
+            fh.seek(0, os.SEEK_END)
+            total_bytes = fh.tell()
+        fh.seek(0)
+        plan = infer_csv_plan(pd.read_csv(fh, nrows=sample_rows))
+        fh.seek(0)
+
+        os.makedirs(workdir, exist_ok=True)
+        parts, rows = [], 0
+        for i, chunk in enumerate(pd.read_csv(fh, chunksize=chunk_rows, dtype=plan)):
+            chunk = downcast_chunk(chunk)
+            chunk.columns = [str(c) for c in chunk.columns]
+            part = os.path.join(workdir, f"part-{i:05d}.parquet")
+            pq.write_table(pa.Table.from_pandas(chunk, preserve_index=False), part)
+            parts.append(part)
+            rows += len(chunk)
+            if progress is not None:
+                done = min(fh.tell() / total_bytes, 1.0) if total_bytes else 0.0
+                progress(rows, done)
+    finally:
+        if own:
+            fh.close()
+
+    if not parts:
+        return pd.DataFrame(), {"rows": 0, "chunks": 0, "disk_bytes": 0, "memory_bytes": 0}
+    schema = _unify_column_types([pq.read_schema(p) for p in parts])
+    table = pa.concat_tables([_cast_table(pq.read_table(p), schema) for p in parts])
+    df = table.to_pandas()
+    del table
+    info = {
+        "rows": rows,
+        "chunks": len(parts),
+        "disk_bytes": sum(os.path.getsize(p) for p in parts),
+        "memory_bytes": frame_nbytes(df),
+    }
+    return df, info
+
+
+# ----------------------------
+# Excel ingest (read-only streaming, sheet/range selection, parallel sheets)
+# ----------------------------
+def excel_sheet_names(data: bytes, kind: str = "xlsx"):
+    if kind == "xls":
+        import xlrd
+        return xlrd.open_workbook(file_contents=data, on_demand=True).sheet_names()
+    from openpyxl import load_workbook
+    wb = load_workbook(io.BytesIO(data), read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def column_range(spec: str):
+    """'B:F' -> (2, 6) as 1-based openpyxl column numbers; '' -> (None, None)."""
+    from openpyxl.utils import column_index_from_string
+
+    spec = (spec or "").strip().upper()
+    if not spec:
+        return None, None
+    first, _, last = spec.partition(":")
+    lo = column_index_from_string(first) if first else None
+    hi = column_index_from_string(last or first) if (last or first) else None
+    return lo, hi
+
+
+def _header_names(row):
+    names, seen = [], {}
+    for i, value in enumerate(row):
+        name = f"Unnamed: {i}" if value is None else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def read_xlsx_sheet(data: bytes, sheet=None, first_row: int = None, last_row: int = None,
+                    columns: str = "") -> pd.DataFrame:
+    """One sheet through openpyxl's read-only mode; the first row of the range is the header."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet is not None else wb[wb.sheetnames[0]]
+        min_col, max_col = column_range(columns)
+        rows = ws.iter_rows(min_row=first_row or 1, max_row=last_row, min_col=min_col, max_col=max_col,
+                            values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        body = [r for r in rows if any(v is not None for v in r)]
+    finally:
+        wb.close()
+    return pd.DataFrame(body, columns=_header_names(header))
+
+
+def read_xls_sheet(data: bytes, sheet=None, first_row: int = None, last_row: int = None,
+                   columns: str = "") -> pd.DataFrame:
+    skip = (first_row or 1) - 1
+    nrows = None if last_row is None else max(last_row - skip - 1, 0)
+    return pd.read_excel(io.BytesIO(data), engine="xlrd", sheet_name=sheet if sheet is not None else 0,
+                         skiprows=skip, nrows=nrows, usecols=(columns or None))
+
+
+def _sheet_job(args):
+    kind, data, sheet, first_row, last_row, columns = args
+    reader = read_xls_sheet if kind == "xls" else read_xlsx_sheet
+    return reader(data, sheet, first_row, last_row, columns)
+
+
+def read_excel_fast(data: bytes, kind: str = "xlsx", sheets=None, first_row: int = None,
+                    last_row: int = None, columns: str = "", max_workers: int = None) -> pd.DataFrame:
+    """Read one or more sheets; several sheets are parsed in a process pool and stacked.
+
+    With more than one sheet, a "sheet" column records where each row came from.
+    """
+    sheets = list(sheets or [None])
+    jobs = [(kind, data, sheet, first_row, last_row, columns) for sheet in sheets]
+    if len(jobs) == 1:
+        return _sheet_job(jobs[0])
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = min(len(jobs), max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        frames = list(pool.map(_sheet_job, jobs))
+    for sheet, frame in zip(sheets, frames):
+        frame.insert(0, "sheet", sheet)
+    return pd.concat(frames, ignore_index=True, sort=False)
+
+
+# ----------------------------
+# Batch ingest: many files (or a .zip) -> one aligned frame
+# ----------------------------
+def expand_zip(data: bytes):
+    """[(member name, bytes)] for the supported files inside a zip archive."""
+    import zipfile
+
+    out = []
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        for info in zf.infolist():
+            base = os.path.basename(info.filename)
+            if info.is_dir() or info.filename.startswith("__MACOSX/") or base.startswith("."):
+                continue
+            if file_kind(base) is not None:
+                out.append((info.filename, zf.read(info)))
+    return out
+
+
+def _parse_file_job(args):
+    # runs in a worker process: never raises, so one bad file can't sink the batch
+    import time
+
+    name, data, options = args
+    started = time.perf_counter()
+    try:
+        kind = file_kind(name)
+        if kind is None:
+            raise ValueError("Unsupported file type.")
+        df = parse_bytes(data, kind, options)
+        return name, df, time.perf_counter() - started, None
+    except Exception as e:
+        return name, None, time.perf_counter() - started, f"{type(e).__name__}: {e}"
+
+
+def reconcile_dtypes(frames):
+    """Cast each column to one dtype across frames so concat doesn't fall back to object needlessly."""
+    from pandas.api.types import (is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype,
+                                  union_categoricals)
+
+    columns = {}
+    for frame in frames:
+        for col in frame.columns:
+            columns.setdefault(col, []).append(frame[col].dtype)
+    targets = {}
+    for col, dtypes in columns.items():
+        if all(d == dtypes[0] for d in dtypes):
+            continue
+        if all(isinstance(d, pd.CategoricalDtype) for d in dtypes):
+            cats = union_categoricals([f[col] for f in frames if col in f.columns], ignore_order=True)
+            targets[col] = pd.CategoricalDtype(cats.categories)
+        elif all(is_numeric_dtype(d) and not is_bool_dtype(d) for d in dtypes):
+            targets[col] = np.result_type(*[np.dtype(getattr(d, "numpy_dtype", d)) for d in dtypes])
+        elif all(is_datetime64_any_dtype(d) for d in dtypes):
+            targets[col] = "datetime64[ns]"
+        else:
+            targets[col] = object
+    out = []
+    for frame in frames:
+        cast = {c: t for c, t in targets.items() if c in frame.columns}
+        out.append(frame.astype(cast) if cast else frame)
+    return out
+
+
+def ingest_batch(files, options=None, source_column: str = "source_file", max_workers: int = None):
+    """Parse [(name, bytes)] in a process pool and stack them with the union of their columns.
+
+    .zip entries are expanded first. Returns (df, report) where report has one
+    dict per file with rows, columns, seconds, error (None when it loaded) and
+    note. A file that already has source_column (e.g. an earlier batch export)
+    gets it overwritten, which the note says.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs, results = [], []
+    for name, data in files:
+        if name.lower().endswith(".zip"):
+            try:
+                jobs.extend((f"{name}/{member}", blob, options) for member, blob in expand_zip(data))
+            except Exception as e:
+                results.append((name, None, 0.0, f"{type(e).__name__}: {e}"))
+        else:
+            jobs.append((name, data, options))
+
+    if len(jobs) > 1:
+        workers = min(len(jobs), max_workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_parse_file_job, job) for job in jobs]
+            for job, future in zip(jobs, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:   # e.g. a worker process died
+                    results.append((job[0], None, 0.0, f"{type(e).__name__}: {e}"))
+    else:
+        results.extend(_parse_file_job(job) for job in jobs)
+
+    frames, report = [], []
+    for name, df, seconds, error in results:
+        note = None
+        if df is not None and source_column:
+            if source_column in df.columns:
+                df = df.drop(columns=source_column)
+                note = f"existing {source_column} column replaced"
+            df.insert(0, source_column, pd.Categorical([name] * len(df)))
+        report.append({"file": name, "rows": None if df is None else len(df),
+                       "columns": None if df is None else df.shape[1],
+                       "seconds": round(seconds, 3), "error": error, "note": note})
+        if df is not None:
+            frames.append(df)
+    if not frames:
+        return pd.DataFrame(), report
+    return pd.concat(reconcile_dtypes(frames), ignore_index=True, sort=False), report
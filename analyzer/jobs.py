@@ -0,0 +1,76 @@
+# ----------------------------
+# Background save jobs: a writer thread with progress + cancellation
+# ----------------------------
+import os
+import shutil
+import threading
+import time
+
+import pandas as pd
+
+from analyzer.export import Cancelled, write_export
+
+
+class SaveJob:
+    """Writes df to path on a daemon thread. The file appears under its final name
+    only once it is complete; a cancelled or failed save leaves nothing behind."""
+
+    def __init__(self, df: pd.DataFrame, fmt: str, path: str, **options):
+        self.fmt = fmt
+        self.path = path
+        self.rows = len(df)
+        self.done_rows = 0
+        self.status = "queued"
+        self.error = None
+        self.started = self.finished = None
+        self._cancel = threading.Event()
+        # the thread drops its reference to df when it finishes
+        self._thread = threading.Thread(target=self._run, args=(df, options), daemon=True,
+                                        name=f"save {os.path.basename(path)}")
+
+    def start(self) -> "SaveJob":
+        self._thread.start()
+        return self
+
+    @property
+    def running(self) -> bool:
+        return self.status in ("queued", "running")
+
+    @property
+    def fraction(self) -> float:
+        return min(self.done_rows / self.rows, 1.0) if self.rows else 0.0
+
+    @property
+    def seconds(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout: float = None):
+        self._thread.join(timeout)
+
+    def _progress(self, done: int, total: int):
+        self.done_rows = done
+
+    def _run(self, df: pd.DataFrame, options: dict):
+        self.status = "running"
+        self.started = time.time()
+        part = self.path + ".part"
+        try:
+            write_export(df, self.fmt, part, progress=self._progress, cancel=self._cancel, **options)
+            os.replace(part, self.path)
+            self.status = "done"
+        except Cancelled:
+            self.status = "cancelled"
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+        finally:
+            if os.path.isdir(part):
+                shutil.rmtree(part, ignore_errors=True)
+            elif os.path.exists(part):
+                os.remove(part)
+            self.finished = time.time()
@@ -0,0 +1,69 @@
+# ----------------------------
+# Memory optimizer: smaller numeric dtypes, categories, Arrow strings
+# ----------------------------
+import numpy as np
+import pandas as pd
+from pandas.api.types import (infer_dtype, is_bool_dtype, is_float_dtype, is_integer_dtype, is_object_dtype,
+                              is_string_dtype)
+
+from analyzer.ingest import CATEGORY_MAX_RATIO, CATEGORY_MAX_UNIQUE
+
+
+def arrow_string_dtype():
+    # NaN as the missing value keeps comparisons/masks behaving like object columns
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except TypeError:          # pandas < 2.3
+        return pd.StringDtype("pyarrow")
+
+
+def _is_text(s: pd.Series) -> bool:
+    if isinstance(s.dtype, pd.CategoricalDtype) or is_bool_dtype(s.dtype):
+        return False
+    if is_object_dtype(s.dtype):
+        return infer_dtype(s, skipna=True) == "string"
+    return is_string_dtype(s.dtype)
+
+
+def optimize_column(s: pd.Series, category_ratio: float = CATEGORY_MAX_RATIO,
+                    category_max_unique: int = CATEGORY_MAX_UNIQUE) -> pd.Series:
+    if is_bool_dtype(s.dtype) or isinstance(s.dtype, pd.CategoricalDtype):
+        return s
+    if is_integer_dtype(s.dtype):
+        return pd.to_numeric(s, downcast="integer")
+    if is_float_dtype(s.dtype):
+        # only when every value survives the round trip, so sums/means don't drift
+        small = pd.to_numeric(s, downcast="float")
+        if small.dtype != s.dtype and np.array_equal(small.to_numpy(dtype="float64", na_value=np.nan),
+                                                     s.to_numpy(dtype="float64", na_value=np.nan),
+                                                     equal_nan=True):
+            return small
+        return s
+    if _is_text(s):
+        n = int(s.notna().sum())
+        distinct = s.nunique(dropna=True)
+        if n and distinct <= category_max_unique and distinct / n <= category_ratio:
+            return s.astype("category")
+        dtype = arrow_string_dtype()
+        return s if s.dtype == dtype else s.astype(dtype)
+    return s
+
+
+def optimize_frame(df: pd.DataFrame, **options) -> pd.DataFrame:
+    """Same values in smaller dtypes; columns that can't shrink are passed through uncopied."""
+    return pd.DataFrame({col: optimize_column(df[col], **options) for col in df.columns}, index=df.index)
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    old = before.memory_usage(deep=True, index=False)
+    new = after.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "column": list(before.columns),
+        "dtype before": [str(t) for t in before.dtypes],
+        "dtype after": [str(t) for t in after.dtypes],
+        "MB before": (old.to_numpy() / 1e6).round(3),
+        "MB after": (new.to_numpy() / 1e6).round(3),
+    })
+    report["saved %"] = np.where(report["MB before"] > 0,
+                                 (1 - new.to_numpy() / np.maximum(old.to_numpy(), 1)) * 100, 0.0).round(1)
+    return report
@@ -0,0 +1,250 @@
+# ----------------------------
+# Bulk replace: a whole mapping table, one pass per column
+# ----------------------------
+import numpy as np
+import pandas as pd
+from pandas.api.types import (is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype, is_object_dtype,
+                              is_string_dtype)
+
+
+def with_categories(series: pd.Series, values) -> pd.Series:
+    # a categorical that can also hold `values` (object if the categories won't take them)
+    new = [v for v in dict.fromkeys(values) if not pd.isna(v) and v not in series.cat.categories]
+    if not new:
+        return series
+    try:
+        return series.cat.add_categories(new)
+    except (TypeError, ValueError):
+        return series.astype(object)
+
+
+def _widen(series: pd.Series, values) -> pd.Series:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return with_categories(series, values)
+    if is_numeric_dtype(series.dtype) and not is_bool_dtype(series.dtype) and series.dtype.itemsize < 8:
+        # downcast column (e.g. int16) and a value outside its range
+        return series.astype("float64" if series.dtype.kind == "f" else "int64")
+    return series
+
+
+def set_positions(series: pd.Series, positions, values) -> pd.Series:
+    out = series.copy()
+    try:
+        out.iloc[positions] = values
+        return out
+    except (TypeError, ValueError):
+        pass
+    out = _widen(series, values).copy()
+    try:
+        out.iloc[positions] = values
+    except (TypeError, ValueError):
+        # value doesn't fit the column dtype (e.g. text typed into an int column)
+        out = out.astype(object)
+        out.iloc[positions] = values
+    return out
+
+
+def _same_values(a: pd.Series, b: pd.Series) -> bool:
+    a, b = a.astype(object), b.astype(object)
+    return bool(((a.to_numpy() == b.to_numpy()) | (a.isna().to_numpy() & b.isna().to_numpy())).all())
+
+
+def cast_like(series: pd.Series, values: pd.Series):
+    """(series, values) with values in series' dtype, series widened first if needed.
+
+    Used for rows appended to a column; when no cast is lossless both come back
+    unchanged and concat picks the common type (object as the last resort).
+    """
+    if values.dtype == series.dtype:
+        return series, values
+    candidates = [series, _widen(series, values.dropna())]
+    if series.dtype.kind in "iu":
+        candidates.append(series.astype("float64"))   # blank cells in an int column, as pandas does
+    for column in candidates:
+        try:
+            cast = values.astype(column.dtype)
+        except (TypeError, ValueError, OverflowError):
+            continue
+        if _same_values(cast, values):
+            return column, cast
+    return series, values
+
+
+def parse_literal(text):
+    """'12' -> 12, '1.5' -> 1.5, anything else stays text."""
+    if not isinstance(text, str):
+        return text
+    stripped = text.strip()
+    for cast in (int, float):
+        try:
+            return cast(stripped)
+        except ValueError:
+            pass
+    return text
+
+
+def _is_null(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_))
+
+
+def value_kind(value) -> str:
+    """null / bool / int / float / str / type name. A replace that keeps every value's
+    kind leaves the column's dtype family, and so what later find values match, unchanged."""
+    if _is_null(value):
+        return "null"
+    if isinstance(value, (bool, np.bool_)):
+        return "bool"
+    if isinstance(value, (int, np.integer)):
+        return "int"
+    if isinstance(value, (float, np.floating)):
+        return "float"
+    if isinstance(value, str):
+        return "str"
+    return type(value).__name__
+
+
+def dedupe_mapping(mapping):
+    """[[old, new], ...] with one pair per find value; the first occurrence wins."""
+    seen, out = set(), []
+    for old, new in mapping:
+        key = None if _is_null(old) else (type(old), old)
+        if key not in seen:
+            seen.add(key)
+            out.append([old, new])
+    return out
+
+
+def _pairs_for(series: pd.Series, mapping, match_types: bool):
+    """The mapping pairs that can match this column's values."""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype   # find values are matched against the categories
+    out = []
+    for old, new in mapping:
+        if _is_null(old):
+            out.append((None, new))
+            continue
+        if is_bool_dtype(dtype):
+            ok = isinstance(old, (bool, np.bool_))
+        elif is_numeric_dtype(dtype):
+            if not _is_number(old) and not match_types:
+                old = parse_literal(old)
+            ok = _is_number(old)
+        elif is_datetime64_any_dtype(dtype):
+            try:
+                old, ok = pd.Timestamp(old), not match_types or isinstance(old, pd.Timestamp)
+            except (TypeError, ValueError):
+                ok = False
+        elif is_object_dtype(dtype):
+            ok = True
+            if not match_types:
+                out.append((str(old) if not isinstance(old, str) else parse_literal(old), new))
+        else:   # string dtypes
+            ok = isinstance(old, str)
+            if not ok and not match_types:
+                old, ok = str(old), True
+        if ok:
+            out.append((old, new))
+    return out
+
+
+def _typed_categories(values: list, like: pd.Index) -> pd.Index:
+    # categories typed like rename_categories would type them (e.g. str, not object), but
+    # kept in the old dtype when that is lossless (1.0 written over int categories stays 1)
+    index = pd.Index(values)
+    if index.dtype != like.dtype:
+        try:
+            same = index.astype(like.dtype)
+            if (same == index).all():
+                return same
+        except (TypeError, ValueError):
+            pass
+    return index
+
+
+def _replace_categorical(series: pd.Series, new_cats: list, null_to):
+    if null_to is not None and _is_null(null_to):
+        null_to = None   # nulls -> null leaves them as they are (a category can't be null)
+    cats = list(series.cat.categories)
+    if new_cats == cats and null_to is None:
+        return series
+    if null_to is None and not any(_is_null(c) for c in new_cats) and len(set(new_cats)) == len(new_cats):
+        # categories only, rows untouched
+        return series.cat.rename_categories(_typed_categories(new_cats, series.cat.categories))
+    # merged or nulled categories: remap the integer codes
+    remap, merged = pd.factorize(pd.Index(new_cats, dtype=object))
+    codes = series.cat.codes.to_numpy()
+    new_codes = np.where(codes >= 0, remap[np.maximum(codes, 0)], -1)
+    if null_to is not None:
+        pos = int(np.flatnonzero(merged == null_to)[0]) if null_to in merged else len(merged)
+        if pos == len(merged):
+            merged = merged.append(pd.Index([null_to], dtype=object))
+        new_codes = np.where(codes < 0, pos, new_codes)
+    merged = _typed_categories(merged.tolist(), series.cat.categories)
+    return pd.Series(pd.Categorical.from_codes(new_codes, categories=merged), index=series.index,
+                     name=series.name)
+
+
+def replace_column(series: pd.Series, mapping, regex: bool = False, match_types: bool = True) -> pd.Series:
+    """Replace every pair of `mapping` in one column; returns the same object when nothing matched."""
+    pairs = _pairs_for(series, mapping, match_types)
+    if not pairs:
+        return series
+    null_to = next((new for old, new in pairs if old is None), None)
+    lookup = {}
+    for old, new in pairs:
+        if old is not None:
+            lookup.setdefault(old, new)
+
+    categorical = isinstance(series.dtype, pd.CategoricalDtype)
+    if regex:
+        target = series.cat.categories if categorical else series
+        if not (is_object_dtype(target.dtype) or is_string_dtype(target.dtype)):
+            return series
+        patterns = [k for k in lookup if isinstance(k, str)]
+        if not patterns:
+            return series
+        values = [lookup[k] for k in patterns]
+        if categorical:
+            # rewrite the category labels; labels that end up equal are merged
+            labels = pd.Series(target, dtype=object).replace(to_replace=patterns, value=values, regex=True)
+            return _replace_categorical(series, list(labels), None)
+        return series.replace(to_replace=patterns, value=values, regex=True)
+
+    if categorical:
+        return _replace_categorical(series, [lookup.get(c, c) for c in series.cat.categories], null_to)
+
+    # one hash lookup over the column, then write only the matching rows
+    mask = series.isin(list(lookup)).to_numpy() if lookup else np.zeros(len(series), dtype=bool)
+    positions = np.flatnonzero(mask)
+    # an object mapper writes the mapping's own values (a dict would promote 3 -> 3.0 next to 2.5)
+    mapper = pd.Series(list(lookup.values()), index=pd.Index(list(lookup), dtype=object), dtype=object)
+    values = list(series.iloc[positions].map(mapper)) if len(positions) else []
+    if null_to is not None:
+        nulls = np.flatnonzero(series.isna().to_numpy())
+        positions = np.concatenate([positions, nulls])
+        values = values + [null_to] * len(nulls)
+    if not len(positions):
+        return series
+    out = set_positions(series, positions, values)
+    return out.infer_objects() if is_object_dtype(out.dtype) and not is_object_dtype(series.dtype) else out
+
+
+def replace_values(df: pd.DataFrame, mapping, columns=None, regex: bool = False,
+                   match_types: bool = True) -> pd.DataFrame:
+    """Apply a [[old, new], ...] mapping table to the chosen columns (all by default).
+
+    Untouched columns stay shared with the input frame. When a find value
+    repeats, its first pair wins.
+    """
+    mapping = dedupe_mapping(mapping)
+    out = df.copy(deep=False)
+    for col in (columns if columns else list(df.columns)):
+        new = replace_column(df[col], mapping, regex, match_types)
+        if new is not df[col]:
+            out[col] = new
+    return out
@@ -0,0 +1,111 @@
+# ----------------------------
+# Sort permutations (cached) + top/bottom N by partial selection
+# ----------------------------
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from analyzer.grouping import GroupKeyCache
+from analyzer.store import column_ref
+
+MAX_CACHED_PERMS = 16
+
+
+def _ranks(df: pd.DataFrame, col, ascending: bool, keys: GroupKeyCache, version=None):
+    """(ranks, valid): sorting ranks ascending gives the wanted order, nulls last like pandas."""
+    series = df[col]
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in "iu":
+        values = series.to_numpy()
+        return (values if ascending else ~values), None        # ~x reverses integer order exactly
+    if isinstance(dtype, np.dtype) and dtype.kind == "f":
+        values = series.to_numpy()
+        return (values if ascending else -values), ~np.isnan(values)   # NaN sorts last either way
+    # anything else: ordinal codes from factorize(sort=True), cached per column
+    codes, uniques = keys.codes(df, col, version)
+    n = len(uniques)
+    ranks = codes if ascending else (n - 1 - codes)
+    return np.where(codes < 0, n, ranks), codes >= 0
+
+
+class SortCache:
+    """Row permutations per (key columns, directions), reused while the key columns are unchanged.
+
+    Key columns are factorized once through a GroupKeyCache, so even a new
+    direction or key combination only costs an integer lexsort. A single-key
+    descending sort is derived from the cached ascending permutation.
+    """
+
+    def __init__(self, keys: GroupKeyCache = None):
+        self.keys = keys or GroupKeyCache()
+        self._perms = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _ident(self, df, by, version):
+        """(key per column, weak refs to the arrays behind them)."""
+        refs = [column_ref(df[c]) for c in by]
+        ident = tuple(key or ("version", version, c) for (key, _), c in zip(refs, by))
+        return ident, tuple(ref for _, ref in refs if ref is not None)
+
+    def _lookup(self, key, n):
+        # a dead ref means an address may now belong to a different column
+        hit = self._perms.get(key)
+        if hit is None or len(hit[0]) != n or any(ref() is None for ref in hit[2]):
+            return None
+        return hit
+
+    def _store(self, key, perm, n_valid, refs):
+        self._perms[key] = (perm, n_valid, refs)
+        self._perms.move_to_end(key)
+        while len(self._perms) > MAX_CACHED_PERMS:
+            self._perms.popitem(last=False)
+
+    def permutation(self, df: pd.DataFrame, by, ascending, version=None) -> np.ndarray:
+        by = list(by) if isinstance(by, (list, tuple)) else [by]
+        ascending = [ascending] * len(by) if isinstance(ascending, bool) else list(ascending)
+        ident, refs = self._ident(df, by, version)
+        key = (ident, tuple(by), tuple(ascending))
+        hit = self._lookup(key, len(df))
+        if hit is not None:
+            self.hits += 1
+            self._perms.move_to_end(key)
+            return hit[0]
+        if len(by) == 1:
+            flipped = self._lookup((ident, tuple(by), (not ascending[0],)), len(df))
+            if flipped is not None:
+                # reverse the non-null part, keep nulls at the end
+                self.hits += 1
+                perm, n_valid, _ = flipped
+                perm = np.concatenate([perm[:n_valid][::-1], perm[n_valid:]])
+                self._store(key, perm, n_valid, refs)
+                return perm
+        self.misses += 1
+        ranks, n_valid = [], len(df)
+        for col, asc in zip(by, ascending):
+            r, valid = _ranks(df, col, asc, self.keys, version)
+            ranks.append(r)
+            if valid is not None and len(by) == 1:
+                n_valid = int(np.count_nonzero(valid))
+        perm = np.lexsort(ranks[::-1]) if len(ranks) > 1 else np.argsort(ranks[0], kind="stable")
+        self._store(key, perm, n_valid, refs)
+        return perm
+
+    def sort(self, df: pd.DataFrame, by, ascending, version=None) -> pd.DataFrame:
+        return df.take(self.permutation(df, by, ascending, version))
+
+
+def top_n(df: pd.DataFrame, column, n: int, largest: bool = True, keys: GroupKeyCache = None,
+          version=None) -> pd.DataFrame:
+    """The n largest (or smallest) rows by one column, without sorting the whole frame."""
+    keys = keys or GroupKeyCache()
+    ranks, valid = _ranks(df, column, not largest, keys, version)
+    rows = np.arange(len(df)) if valid is None else np.flatnonzero(valid)
+    ranks = ranks if valid is None else ranks[valid]
+    n = min(int(n), len(rows))
+    if n <= 0:
+        return df.iloc[:0]
+    part = np.argpartition(ranks, n - 1)[:n] if n < len(rows) else np.arange(len(rows))
+    part = part[np.argsort(ranks[part], kind="stable")]
+    return df.iloc[rows[part]]
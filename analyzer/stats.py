@@ -0,0 +1,157 @@
+# ----------------------------
+# Per-column statistics cache
+# ----------------------------
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from analyzer.store import column_ref
+
+HLL_P = 12                 # 4096 registers, ~1.6% standard error
+HLL_M = 1 << HLL_P
+MAX_CACHED_COLUMNS = 4096
+
+# ops that leave a column's statistics unchanged (row order doesn't matter to them)
+ORDER_ONLY_OPS = {"sort"}
+# ops that only change the column named in op["column"]
+ONE_COLUMN_OPS = {"fill_stat", "interpolate"}
+
+
+def hll_registers(series: pd.Series) -> np.ndarray:
+    values = series.dropna()
+    reg = np.zeros(HLL_M, dtype=np.uint8)
+    if len(values) == 0:
+        return reg
+    h = pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+    idx = (h >> np.uint64(64 - HLL_P)).astype(np.int64)
+    rest = (h << np.uint64(HLL_P)) | np.uint64(1 << (HLL_P - 1))   # sentinel bit bounds rho
+    rho = (64 - np.floor(np.log2(rest.astype(np.float64)))).astype(np.uint8)
+    np.maximum.at(reg, idx, rho)
+    return reg
+
+
+def hll_estimate(reg: np.ndarray) -> int:
+    alpha = 0.7213 / (1 + 1.079 / HLL_M)
+    raw = alpha * HLL_M * HLL_M / np.sum(np.exp2(-reg.astype(np.float64)))
+    zeros = int(np.count_nonzero(reg == 0))
+    if raw <= 2.5 * HLL_M and zeros:
+        raw = HLL_M * np.log(HLL_M / zeros)   # small-range correction
+    return int(round(raw))
+
+
+def _scalar(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+def basic_stats(series: pd.Series) -> dict:
+    # what the status footer needs on every rerun: one isna pass
+    return {"dtype": str(series.dtype), "rows": len(series), "nulls": int(series.isna().sum())}
+
+
+def numeric_stat(series: pd.Series, stat: str):
+    if not pd.api.types.is_numeric_dtype(series.dtype):
+        return None
+    return _scalar(series.sum() if stat == "sum" else series.mean())
+
+
+def column_stats(series: pd.Series) -> dict:
+    stats = basic_stats(series)
+    nulls = stats["nulls"]
+    stats.update({
+        "sum": numeric_stat(series, "sum"),
+        "mean": numeric_stat(series, "mean"),
+        "min": None,
+        "max": None,
+        "distinct": None,
+        "_hll": hll_registers(series),
+    })
+    try:
+        stats["min"] = _scalar(series.min())
+        stats["max"] = _scalar(series.max())
+    except (TypeError, ValueError):
+        pass   # mixed object columns have no ordering
+    stats["distinct"] = min(hll_estimate(stats["_hll"]), len(series) - nulls)
+    return stats
+
+
+class StatsCache:
+    """Column statistics for the active data, reused across versions where possible.
+
+    Entries are found by column memory identity (columns shared between
+    versions through copy-on-write keep their stats) while the array they were
+    computed from is still alive, and note_op() carries stats over for ops known
+    to leave some columns unchanged.
+    """
+
+    def __init__(self):
+        self.version = None
+        self._current = {}
+        self._by_key = OrderedDict()
+        self.scans = 0
+
+    def _remember(self, key, ref, stats):
+        if key is None:
+            return
+        self._by_key[key] = (ref, stats)
+        self._by_key.move_to_end(key)
+        while len(self._by_key) > MAX_CACHED_COLUMNS:
+            self._by_key.popitem(last=False)
+
+    def _sync(self, version):
+        if version != self.version:
+            self.version = version
+            self._current = {}
+
+    def column(self, df: pd.DataFrame, version, col, full: bool = True, need: str = None) -> dict:
+        """Stats for one column. full=False stops at basic_stats (dtype/rows/nulls);
+        need="sum"/"mean" adds just that statistic."""
+        self._sync(version)
+        stats = self._current.get(col)
+        if stats is None:
+            series = df[col]
+            key, ref = column_ref(series)
+            hit = self._by_key.get(key) if key is not None else None
+            # a dead ref means the address may now belong to a different column
+            stats = hit[1] if hit is not None and hit[0]() is not None else None
+            if stats is None or stats["rows"] != len(series):
+                stats = column_stats(series) if full else basic_stats(series)
+                self.scans += 1
+                self._remember(key, ref, stats)
+            self._current[col] = stats
+        elif full and "_hll" not in stats:
+            # upgrade in place, so every key sharing this entry sees it
+            stats.update(column_stats(df[col]))
+            self.scans += 1
+        if need is not None and need not in stats:
+            stats[need] = numeric_stat(df[col], need)
+        return stats
+
+    def all(self, df: pd.DataFrame, version, full: bool = True) -> dict:
+        return {col: self.column(df, version, col, full) for col in df.columns}
+
+    def note_op(self, old_version, new_version, op: dict, new_df: pd.DataFrame):
+        """Carry stats from the previous version for columns the op cannot have changed."""
+        if op is None or old_version != self.version or not self._current:
+            return
+        kind = op.get("op")
+        keep = set()
+        if kind in ORDER_ONLY_OPS:
+            keep = set(self._current)
+        elif kind in ONE_COLUMN_OPS:
+            keep = set(self._current) - {op.get("column")}
+        elif kind == "edit" and not op.get("drop_rows") and not op.get("add_rows"):
+            keep = set(self._current) - {c for _, c, _ in op.get("cells", [])}
+        carried = {c: s for c, s in self._current.items() if c in keep and c in new_df.columns}
+        self.version = new_version
+        self._current = carried
+        for col, stats in carried.items():
+            self._remember(*column_ref(new_df[col]), stats)
+
+    def frame(self, df: pd.DataFrame, version) -> pd.DataFrame:
+        """Profile table: one row per column."""
+        rows = {str(c): {k: v for k, v in s.items() if not k.startswith("_")}
+                for c, s in self.all(df, version).items()}
+        return pd.DataFrame.from_dict(rows, orient="index")
@@ -0,0 +1,285 @@
+# ----------------------------
+# Versioned DataFrame store (copy-on-write + undo/redo)
+# ----------------------------
+import os
+import shutil
+import tempfile
+import weakref
+
+import numpy as np
+import pandas as pd
+
+# versions share unchanged column blocks instead of copying them (always on from pandas 3)
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+DEFAULT_HISTORY_BUDGET_MB = 512
+DEFAULT_HISTORY_DEPTH = 20
+
+
+def _backing(series: pd.Series):
+    # the numpy array (categorical codes included) or Arrow ChunkedArray holding the values
+    values = series.array
+    data = series.values if isinstance(series.values, np.ndarray) else getattr(values, "codes", None)
+    if isinstance(data, np.ndarray):
+        return data
+    if hasattr(values, "__arrow_array__"):
+        try:
+            return values.__arrow_array__()
+        except Exception:
+            return None
+    return None
+
+
+def column_key(series: pd.Series):
+    # identity of the memory behind a column, so shared blocks are only counted once
+    data = _backing(series)
+    if isinstance(data, np.ndarray):
+        return ("np", data.__array_interface__["data"][0], data.nbytes)
+    if data is not None:
+        chunks = data.chunks
+        # slices are zero-copy in Arrow: same buffers, different offset/length
+        return ("arrow", len(chunks), len(series)) + tuple(
+            (c.offset, len(c)) + tuple(b.address for b in c.buffers() if b is not None) for c in chunks[:1])
+    return None
+
+
+def column_ref(series: pd.Series):
+    """(column_key, weak reference to the array owning that memory), or (None, None).
+
+    A key is only an address, which the allocator hands to a new column once the
+    old one is freed; a cache entry stored with the ref is valid while ref() is alive.
+    """
+    key = column_key(series)
+    if key is None:
+        return None, None
+    owner = _backing(series)
+    while isinstance(getattr(owner, "base", None), np.ndarray):
+        owner = owner.base
+    try:
+        return key, weakref.ref(owner)
+    except TypeError:
+        return None, None
+
+
+class _Version:
+    def __init__(self, df: pd.DataFrame, label: str):
+        self.df = df
+        self.label = label
+        self.columns = []  # [(key, nbytes)] of the columns held in RAM
+        self.layout = None  # (labels, index, [(key, nbytes)] per position) once spilled
+        self.kept = {}  # position -> Series still held in RAM once spilled
+        self.parts = []  # [(path, {position: item in the pickled list})]
+        self._files = None  # path -> number of versions reading it (shared by the store)
+
+    @property
+    def spilled(self):
+        return self.df is None
+
+    def detach(self):
+        if self.df is not None:
+            self.layout = (self.df.columns, self.df.index, list(self.columns))
+            self.kept = {i: self.df.iloc[:, i] for i in range(self.df.shape[1])}
+            self.df = None
+
+    def key(self, position: int):
+        return self.layout[2][position][0]
+
+    def written(self, path: str, items: dict, files: dict):
+        for i in items:
+            del self.kept[i]
+        self.parts.append((path, items))
+        self._files = files
+        files[path] = files.get(path, 0) + 1
+        self.columns = [self.layout[2][i] for i in self.kept]
+
+    def load(self) -> pd.DataFrame:
+        if self.df is None:
+            labels, index, _ = self.layout
+            series = dict(self.kept)
+            for path, items in self.parts:
+                values = pd.read_pickle(path)
+                series.update((i, values[j]) for i, j in items.items())
+            df = pd.DataFrame(index=index)
+            for i in range(len(labels)):
+                df.insert(i, i, series[i], allow_duplicates=True)
+            df.columns = labels
+            self.drop()
+            self.df = df
+        return self.df
+
+    def drop(self):
+        for path, _ in self.parts:
+            self._files[path] -= 1
+            if not self._files[path]:
+                del self._files[path]
+                if os.path.exists(path):
+                    os.remove(path)
+        self.df = None
+        self.layout, self.kept, self.parts = None, {}, []
+        self.columns = []
+
+
+class DataStore:
+    """Active DataFrame plus a bounded undo/redo history.
+
+    Versions share unchanged columns through pandas copy-on-write. When the
+    estimated memory of all in-RAM versions goes over the budget, the columns
+    of the oldest history entries that no version in RAM shares are pickled to
+    disk and loaded back on undo/redo.
+    """
+
+    def __init__(self, budget_bytes: int = DEFAULT_HISTORY_BUDGET_MB * 1024 * 1024,
+                 max_history: int = DEFAULT_HISTORY_DEPTH):
+        self.budget_bytes = int(budget_bytes)
+        self.max_history = int(max_history)
+        self.version = 0
+        self._current = _Version(pd.DataFrame(), "empty")
+        self._undo = []
+        self._redo = []
+        self._dir = None
+        self._spills = 0
+        self._files = {}
+
+    # --- access
+    @property
+    def current(self) -> pd.DataFrame:
+        return self._current.df
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def history(self):
+        """Labels oldest -> newest, and the index of the current one."""
+        labels = [v.label for v in self._undo] + [self._current.label] + [v.label for v in reversed(self._redo)]
+        return labels, len(self._undo)
+
+    # --- changes
+    def reset(self, df: pd.DataFrame, label: str = "open"):
+        for v in self._undo + self._redo:
+            v.drop()
+        self._undo, self._redo = [], []
+        return self._set_current(df, label)
+
+    def commit(self, df: pd.DataFrame, label: str = "edit"):
+        self._undo.append(self._current)
+        for v in self._redo:
+            v.drop()
+        self._redo = []
+        while len(self._undo) > self.max_history:
+            self._undo.pop(0).drop()
+        return self._set_current(df, label)
+
+    def undo(self):
+        if not self._undo:
+            return self.current
+        self._redo.append(self._current)
+        self._current = self._undo.pop()
+        return self._activate()
+
+    def redo(self):
+        if not self._redo:
+            return self.current
+        self._undo.append(self._current)
+        self._current = self._redo.pop()
+        return self._activate()
+
+    # --- memory
+    def memory_bytes(self) -> int:
+        seen = {}
+        for v in self._undo + [self._current] + self._redo:
+            for i, (key, nbytes) in enumerate(v.columns):
+                seen[key if key is not None else ("own", id(v), i)] = nbytes
+        return sum(seen.values())
+
+    def column_keys(self) -> set:
+        """Memory identities of the columns held in RAM by any version."""
+        return {key for v in self._undo + [self._current] + self._redo for key, _ in v.columns if key is not None}
+
+    def spilled_count(self) -> int:
+        return sum(1 for v in self._undo + self._redo if v.spilled)
+
+    def close(self):
+        for v in self._undo + self._redo:
+            v.drop()
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    # --- internals
+    def _in_memory(self):
+        return [v for v in self._undo + [self._current] + self._redo if not v.spilled]
+
+    def _measure(self, v: _Version):
+        known = {k: n for other in self._in_memory() for k, n in other.columns if k is not None}
+        cols = []
+        for i in range(v.df.shape[1]):
+            s = v.df.iloc[:, i]
+            key = column_key(s)
+            nbytes = known.get(key)
+            if nbytes is None:
+                nbytes = int(s.memory_usage(index=False, deep=True))
+            cols.append((key, nbytes))
+        v.columns = cols
+
+    def _set_current(self, df: pd.DataFrame, label: str):
+        self._current = _Version(df, label)
+        return self._activate()
+
+    def _activate(self):
+        self._current.load()
+        if not self._current.columns:
+            self._measure(self._current)
+        self.version += 1
+        self._enforce_budget()
+        return self._current.df
+
+    def _enforce_budget(self):
+        # oldest undo entries first, then the far end of the redo stack
+        for v in self._undo + self._redo:
+            if self.memory_bytes() <= self.budget_bytes:
+                break
+            # a column another version in RAM shares frees nothing when pickled
+            keep = {k for other in self._in_memory() if other is not v for k, _ in other.columns}
+            if all(k is not None and k in keep for k, _ in v.columns):
+                continue
+            self._spill(v, keep)
+
+    def _spill(self, v: _Version, keep: set):
+        v.detach()
+        values, items, written = [], {}, {}
+        for i in list(v.kept):
+            key = v.key(i)
+            if key is not None and key in keep:
+                continue
+            if key is None or key not in written:
+                values.append(v.kept[i])
+                if key is not None:
+                    written[key] = len(values) - 1
+            items[i] = written.get(key, len(values) - 1)
+        # spilled versions still holding the same columns read them from this file too,
+        # so each column is written once and leaves RAM with its last reference
+        moved = [(v, items)]
+        for other in self._undo + self._redo:
+            if other is not v and other.spilled:
+                shared = {i: written[other.key(i)] for i in other.kept if other.key(i) in written}
+                if shared:
+                    moved.append((other, shared))
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix="analyzer-history-")
+        self._spills += 1
+        path = os.path.join(self._dir, f"v{self._spills}.pkl")
+        pd.to_pickle(values, path)
+        for version, positions in moved:
+            version.written(path, positions, self._files)
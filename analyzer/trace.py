@@ -0,0 +1,144 @@
+# ----------------------------
+# Per-operation timing / memory trace
+# ----------------------------
+import json
+import os
+import sys
+import time
+from collections import deque
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:            # Windows
+    resource = None
+
+MAX_SPANS = 2000
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+# ru_maxrss is KiB on Linux, bytes on macOS
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def rss_bytes():
+    # resident set size right now; falls back to the high-water mark off Linux
+    try:
+        with open("/proc/self/statm", "rb") as fh:
+            return int(fh.read().split()[1]) * _PAGE
+    except OSError:
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+
+
+def _delta(after, before):
+    return None if after is None or before is None else after - before
+
+
+class Span:
+    __slots__ = ("tracer", "name", "run", "depth", "start", "seconds", "rss_before", "peak_before",
+                 "rss_delta", "peak_delta", "rows", "cols", "info")
+
+    def __init__(self, tracer, name: str):
+        self.tracer = tracer
+        self.name = name
+        self.rows = self.cols = None
+        self.info = {}
+
+    def touch(self, df=None, **info):
+        # rows / columns the step worked on, plus any extra detail for the trace
+        if df is not None:
+            self.rows, self.cols = df.shape
+        self.info.update(info)
+
+    def __enter__(self):
+        tracer = self.tracer
+        self.run = tracer.run
+        self.depth = tracer._depth
+        tracer._depth += 1
+        self.rss_before = rss_bytes()
+        self.peak_before = peak_rss_bytes()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self.start
+        self.rss_delta = _delta(rss_bytes(), self.rss_before)
+        self.peak_delta = _delta(peak_rss_bytes(), self.peak_before)
+        if exc_type is not None:
+            self.info["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._depth -= 1
+        self.tracer.spans.append(self)
+        return False
+
+
+class _NullSpan:
+    # what span() hands out while tracing is off: no clock reads, no allocation
+    __slots__ = ()
+
+    def touch(self, df=None, **info):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    def __init__(self, max_spans: int = MAX_SPANS):
+        self.enabled = False
+        self.run = 0
+        self.spans = deque(maxlen=max_spans)
+        self._depth = 0
+        self._epoch = time.perf_counter()
+
+    def span(self, name: str):
+        return Span(self, name) if self.enabled else NULL_SPAN
+
+    def rerun(self):
+        # one span per script run; the caller enters it at the top and exits it at the bottom
+        self.run += 1
+        self._depth = 0
+        return self.span(f"rerun #{self.run}")
+
+    def clear(self):
+        self.spans.clear()
+
+    def __len__(self):
+        return len(self.spans)
+
+    def frame(self) -> pd.DataFrame:
+        rows = [{
+            "run": s.run,
+            "step": "  " * s.depth + s.name,
+            "ms": round(s.seconds * 1000, 2),
+            "rss_delta_mb": None if s.rss_delta is None else round(s.rss_delta / 1e6, 2),
+            "peak_rss_delta_mb": None if s.peak_delta is None else round(s.peak_delta / 1e6, 2),
+            "rows": s.rows,
+            "cols": s.cols,
+            "info": ", ".join(f"{k}={v}" for k, v in s.info.items()),
+        } for s in sorted(self.spans, key=lambda s: s.start)]
+        frame = pd.DataFrame(rows, columns=["run", "step", "ms", "rss_delta_mb", "peak_rss_delta_mb",
+                                            "rows", "cols", "info"])
+        return frame.astype({"rows": "Int64", "cols": "Int64"})
+
+    def to_json(self) -> str:
+        # Chrome trace event format: open in chrome://tracing or ui.perfetto.dev
+        events = []
+        for s in self.spans:
+            args = {"run": s.run, "rows": s.rows, "cols": s.cols,
+                    "rss_delta_bytes": s.rss_delta, "peak_rss_delta_bytes": s.peak_delta}
+            args.update({k: str(v) for k, v in s.info.items()})
+            events.append({"name": s.name, "ph": "X", "pid": os.getpid(), "tid": 0,
+                           "ts": round((s.start - self._epoch) * 1e6), "dur": round(s.seconds * 1e6),
+                           "args": args})
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, indent=1)
@@ -1,10 +1,34 @@
 # Data Analyser app by Tawseef Ahmad
 import os
 import os
+import tempfile
 import pandas as pd
 import numpy as np
 import streamlit as st
 import openpyxl
+from analyzer.ingest import (IngestCache, cache_key, content_hash, excel_sheet_names, file_kind, ingest_batch,
+                             stream_csv, DEFAULT_BUDGET_MB)
+from analyzer.export import ExportCache, FORMATS
+from analyzer.jobs import SaveJob
+from analyzer.store import DataStore, DEFAULT_HISTORY_BUDGET_MB, DEFAULT_HISTORY_DEPTH
+from analyzer.engine import Plan, apply_op, describe
+from analyzer.stats import StatsCache
+from analyzer.grouping import AGGS, GroupKeyCache, group_aggregate, pivot
+from analyzer.sorting import SortCache, top_n
+from analyzer.replace import dedupe_mapping, parse_literal
+from analyzer.grid import PAGE_SIZES, diff_to_op, view_positions, window
+from analyzer.optimize import memory_report, optimize_frame
+from analyzer.trace import Tracer
+
+# Shared dataset budget (MB) for every session of this server process; idle datasets
+# over it are spilled to memory-mapped files (in ANALYZER_SPILL_DIR, default: system temp)
+INGEST_BUDGET_MB = int(os.environ.get("ANALYZER_INGEST_BUDGET_MB", DEFAULT_BUDGET_MB))
+SPILL_DIR = os.environ.get("ANALYZER_SPILL_DIR") or None
+# Undo history budget (MB) and depth, per session; older versions spill to disk
+HISTORY_BUDGET_MB = int(os.environ.get("ANALYZER_HISTORY_BUDGET_MB", DEFAULT_HISTORY_BUDGET_MB))
+HISTORY_DEPTH = int(os.environ.get("ANALYZER_HISTORY_DEPTH", DEFAULT_HISTORY_DEPTH))
+# Server-side CSVs can only be streamed from inside this directory; unset = feature hidden
+SERVER_DATA_DIR = os.environ.get("ANALYZER_SERVER_DATA_DIR") or None
 
 # ----------------------------
 # Excel-style UI + Watermark
@@ -58,12 +82,302 @@ if "loaded_name" not in st.session_state:
     st.session_state.loaded_name = ""
 if "preview_df" not in st.session_state:
     st.session_state.preview_df = None
+if "loaded_key" not in st.session_state:
+    st.session_state.loaded_key = None
+if "source_keys" not in st.session_state:
+    st.session_state.source_keys = {}   # "upload" / "server" / "batch" -> key it last opened
+if "upload_digests" not in st.session_state:
+    st.session_state.upload_digests = {}
+if "batch_report" not in st.session_state:
+    st.session_state.batch_report = None
+if "sheet_names" not in st.session_state:
+    st.session_state.sheet_names = (None, [])
+if "store" not in st.session_state:
+    st.session_state.store = DataStore(HISTORY_BUDGET_MB * 1024 * 1024, HISTORY_DEPTH)
+if "exports" not in st.session_state:
+    st.session_state.exports = ExportCache()
+if "plan" not in st.session_state:
+    st.session_state.plan = Plan()
+if "last_plan" not in st.session_state:
+    st.session_state.last_plan = Plan()
+if "stats" not in st.session_state:
+    st.session_state.stats = StatsCache()
+if "group_keys" not in st.session_state:
+    st.session_state.group_keys = GroupKeyCache()
+if "sorter" not in st.session_state:
+    st.session_state.sorter = SortCache(st.session_state.group_keys)
+if "grid_view" not in st.session_state:
+    st.session_state.grid_view = (None, None)
+if "save_jobs" not in st.session_state:
+    st.session_state.save_jobs = []
+if "plan_previews" not in st.session_state:
+    st.session_state.plan_previews = {}
+if "memory_report" not in st.session_state:
+    st.session_state.memory_report = None
+if "tracer" not in st.session_state:
+    st.session_state.tracer = Tracer()
+
+# timings are only recorded while the Diagnostics panel's switch is on
+tracer = st.session_state.tracer
+tracer.enabled = bool(st.session_state.get("tracing"))
+rerun_span = tracer.rerun()
+rerun_span.__enter__()
 
 # ----------------------------
 # Helpers
 # ----------------------------
-def set_df(new_df: pd.DataFrame):
-    st.session_state.df = new_df.copy()
+def set_df(new_df: pd.DataFrame, label: str = "edit", op: dict = None):
+    # copy-on-write: the store keeps the previous version without copying unchanged columns
+    with tracer.span(f"set_df: {label}") as span:
+        old_version = st.session_state.store.version
+        st.session_state.df = st.session_state.store.commit(new_df, label)
+        st.session_state.stats.note_op(old_version, st.session_state.store.version, op, st.session_state.df)
+        span.touch(st.session_state.df)
+
+def reset_df(new_df: pd.DataFrame, label: str = "open"):
+    st.session_state.df = st.session_state.store.reset(new_df, label)
+
+def undo_df():
+    st.session_state.df = st.session_state.store.undo()
+
+def redo_df():
+    st.session_state.df = st.session_state.store.redo()
+
+def execute_op(df: pd.DataFrame, op: dict) -> pd.DataFrame:
+    # sorts reuse cached permutations; everything else goes straight to the engine
+    if op["op"] == "sort":
+        return st.session_state.sorter.sort(df, op["by"], op.get("ascending", True), st.session_state.store.version)
+    return apply_op(df, op)
+
+def run_op(op: dict) -> bool:
+    # lazy mode only records the op; returns True when the active data changed now
+    if st.session_state.get("lazy"):
+        st.session_state.plan.add(op)
+        st.info(f"Queued: {describe(op)} ({len(st.session_state.plan)} pending)")
+        return False
+    with tracer.span(describe(op)) as span:
+        span.touch(st.session_state.df)
+        set_df(execute_op(st.session_state.df, op), describe(op), op)
+    return True
+
+def materialize() -> pd.DataFrame:
+    # run the pending plan (if any) so the active data is up to date
+    plan = st.session_state.plan
+    if len(plan):
+        set_df(plan.execute(st.session_state.df), f"plan ({len(plan)} steps)")
+        st.session_state.last_plan = Plan(plan.steps)
+        plan.clear()
+    return st.session_state.df
+
+def run_plan():
+    try:
+        materialize()
+    except Exception as e:
+        st.error(f"Plan failed, nothing was changed: {e}")
+
+def replay_plan(plan: Plan):
+    for op in plan.steps:
+        st.session_state.plan.add(op)
+    if not st.session_state.get("lazy"):
+        run_plan()
+
+def plan_preview(plan: Plan, start: int, stop: int):
+    # a plan with a step that is not row-local runs over all rows, so keep the result
+    # per (data version, pending steps, window) instead of recomputing it every rerun
+    state = (st.session_state.store.version, plan.to_json())
+    previews = st.session_state.plan_previews
+    if any(key[:2] != state for key in previews):
+        previews.clear()
+    key = state + (start, stop)
+    if key not in previews:
+        try:
+            previews[key] = (plan.preview(st.session_state.df, start, stop), None)
+        except Exception as e:
+            previews[key] = (None, e)
+    return previews[key]
+
+def show_head(n: int = 10, start: int = 0):
+    # with a pending plan, only the shown rows are computed when the plan allows it
+    plan = st.session_state.plan
+    if len(plan):
+        st.caption(f"Preview including {len(plan)} pending step(s)")
+        rows, error = plan_preview(plan, start, start + n)
+        if error is None:
+            st.dataframe(rows, use_container_width=True)
+        else:
+            st.error(f"A pending step fails on this data: {error}")
+    else:
+        st.dataframe(st.session_state.df.iloc[start:start + n], use_container_width=True)
+
+@st.cache_resource
+def get_ingest_cache():
+    return IngestCache(INGEST_BUDGET_MB * 1024 * 1024, spill_dir=SPILL_DIR)
+
+def upload_digest(uploaded) -> str:
+    # hash each uploaded file once per session, not on every rerun
+    file_id = getattr(uploaded, "file_id", None) or getattr(uploaded, "id", None)
+    digests = st.session_state.upload_digests
+    if file_id is None or file_id not in digests:
+        digest = content_hash(uploaded.getvalue())
+        if file_id is None:
+            return digest
+        digests.clear()
+        digests[file_id] = digest
+    return digests[file_id]
+
+def sheet_names_for(uploaded, kind):
+    digest = upload_digest(uploaded)
+    cached_digest, names = st.session_state.sheet_names
+    if cached_digest != digest:
+        names = excel_sheet_names(uploaded.getvalue(), kind)
+        st.session_state.sheet_names = (digest, names)
+    return names
+
+def excel_options(uploaded, kind) -> dict:
+    # sheet / range pickers; the chosen options are part of the ingest cache key
+    names = sheet_names_for(uploaded, kind)
+    sheets = st.multiselect("Sheets (several are parsed in parallel and stacked)", names, default=names[:1])
+    e1, e2, e3 = st.columns(3)
+    with e1:
+        first_row = st.number_input("Header row", min_value=1, value=1, step=1)
+    with e2:
+        last_row = st.number_input("Last row (0 = all)", min_value=0, value=0, step=1)
+    with e3:
+        columns = st.text_input("Columns, e.g. A:F (blank = all)", value="").strip().upper()
+    return {"sheets": tuple(sheets or names[:1]),
+            "first_row": int(first_row) if first_row > 1 else None,
+            "last_row": int(last_row) or None,
+            "columns": columns}
+
+def load_streamed(source, key, total_bytes=None):
+    # chunked CSV read through on-disk Parquet parts, with a live row counter
+    cache = get_ingest_cache()
+    df = cache.get(key)
+    if df is not None:
+        return df, True
+    bar = st.progress(0.0, text="Streaming CSV...")
+    def progress(rows, fraction):
+        bar.progress(fraction, text=f"{rows:,} rows loaded")
+    with tracer.span("load: stream CSV") as span, \
+            tempfile.TemporaryDirectory(prefix="analyzer-ingest-") as workdir:
+        df, info = stream_csv(source, workdir, progress=progress, total_bytes=total_bytes)
+        span.touch(df, bytes=total_bytes)
+    bar.empty()
+    return cache.put(key, df, meta=info), False
+
+def server_data_path(name: str) -> str:
+    # resolve inside SERVER_DATA_DIR (symlinks and ".." included) or refuse
+    root = os.path.realpath(SERVER_DATA_DIR)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"Only files under {SERVER_DATA_DIR} can be opened.")
+    return path
+
+def load_batch(files, add_source: bool):
+    # whole batches are cached too, keyed by the member digests in upload order
+    digests = [content_hash(f.getvalue()) for f in files]
+    key = cache_key(content_hash("|".join(digests).encode()), "batch", {"source": add_source})
+    cache = get_ingest_cache()
+    df = cache.get(key)
+    if df is not None:
+        return key, df, True
+    with st.spinner(f"Parsing {len(files)} file(s) in parallel..."), tracer.span("load: batch") as span:
+        df, report = ingest_batch([(f.name, f.getvalue()) for f in files],
+                                  source_column="source_file" if add_source else None)
+        span.touch(df, files=len(files))
+    st.session_state.batch_report = pd.DataFrame(report)
+    return key, cache.put(key, df, meta={"files": len(report)}), False
+
+def source_changed(source, key) -> bool:
+    # an input only re-opens when its own file/options change: the single-file uploader
+    # still holds its upload after a batch is opened, and must not replace the batch
+    return st.session_state.source_keys.get(source) != key
+
+def activate_loaded(key, df, name, cached, source):
+    # only a genuinely new file replaces the active data (keeps edits across reruns)
+    st.session_state.source_keys[source] = key
+    if key != st.session_state.loaded_key:
+        if st.session_state.get("optimize_on_load"):
+            with tracer.span("optimize memory (on load)") as span:
+                optimized = optimize_frame(df)
+                st.session_state.memory_report = memory_report(df, optimized)
+                span.touch(df)
+            df = optimized
+        # columns the session keeps sharing with the cached frame keep it from being spilled
+        get_ingest_cache().attach(st.session_state.store)
+        reset_df(df, f"open {name}")
+        st.session_state.loaded_key = key
+        st.session_state.loaded_name = name
+        st.success("File loaded successfully...." + (" (from cache)" if cached else ""))
+
+def optimize_memory():
+    op = {"op": "optimize"}
+    before = materialize()
+    with tracer.span(describe(op)) as span:
+        span.touch(before)
+        set_df(apply_op(before, op), describe(op), op)
+        st.session_state.memory_report = memory_report(before, st.session_state.df)
+
+def start_save(fmt: str, path: str, options: dict):
+    # the writer thread gets the current (immutable, copy-on-write) frame; the session carries on
+    df = materialize()
+    with tracer.span(f"save start {path}") as span:
+        span.touch(df)
+        st.session_state.save_jobs = st.session_state.save_jobs[-9:] + [SaveJob(df, fmt, path, **options).start()]
+
+def show_save_jobs():
+    for job in reversed(st.session_state.save_jobs):
+        name = os.path.basename(job.path)
+        if job.running:
+            j1, j2 = st.columns([5, 1])
+            with j1:
+                st.progress(job.fraction, text=f"Saving {name}: {job.done_rows:,} / {job.rows:,} rows "
+                                                f"({job.seconds:.0f}s)")
+            with j2:
+                st.button("Cancel", key=f"cancel_save_{id(job)}", on_click=job.cancel)
+        elif job.status == "done":
+            st.caption(f"✅ Saved {name} ({job.rows:,} rows in {job.seconds:.1f}s)")
+        elif job.status == "cancelled":
+            st.caption(f"✖ Cancelled {name}")
+        else:
+            st.error(f"Save of {name} failed: {job.error}")
+
+def fill_value(col, stat: str):
+    value = st.session_state.stats.column(st.session_state.df, st.session_state.store.version, col,
+                                          full=False, need=stat)[stat]
+    if value is None:
+        raise ValueError(f"{col} isn't numeric")
+    return value
+
+def null_counts() -> pd.Series:
+    stats = st.session_state.stats.all(st.session_state.df, st.session_state.store.version, full=False)
+    return pd.Series({c: s["nulls"] for c, s in stats.items()}, dtype="int64")
+
+def mapping_from_table(table: pd.DataFrame, parse_numbers: bool):
+    # first two columns are find / replace-with; "<null>" stands for a missing value
+    pairs = []
+    for old, new in table.iloc[:, :2].itertuples(index=False, name=None):
+        if old is None or (isinstance(old, float) and pd.isna(old)) or str(old) == "":
+            continue
+        old, new = ["" if v is None or (isinstance(v, float) and pd.isna(v)) else v for v in (old, new)]
+        old, new = [None if str(v).strip() == "<null>" else (parse_literal(v) if parse_numbers else v)
+                     for v in (old, new)]
+        pairs.append([old, new])
+    return dedupe_mapping(pairs)
+
+def grid_positions(filter_col, filter_text, sort_col, ascending):
+    # sorted/filtered row order is cached until the data or the view settings change
+    key = (st.session_state.store.version, filter_col, filter_text, sort_col, ascending)
+    cached_key, positions = st.session_state.grid_view
+    if cached_key != key:
+        positions = view_positions(st.session_state.df, filter_col, filter_text, sort_col, ascending)
+        st.session_state.grid_view = (key, positions)
+    return positions
+
+def apply_grid_edits(editor_key, positions, start):
+    op = diff_to_op(st.session_state.get(editor_key) or {}, positions, start, st.session_state.df.columns)
+    if op["cells"] or op["drop_rows"] or op["add_rows"]:
+        set_df(apply_op(st.session_state.df, op), describe(op), op)
 
 def require_df():
     if st.session_state.df.empty:
@@ -72,24 +386,50 @@ def require_df():
     return True
 
 def download_button_for_df(df: pd.DataFrame, filename_base: str):
-    c1, c2 = st.columns(2)
-    with c1:
-        csv = df.to_csv(index=False).encode("utf-8")
-        st.download_button("💾 Download CSV", data=csv, file_name=f"{filename_base}.csv", mime="text/csv")
-    with c2:
-        # Write Excel to bytes
-        buffer = io.BytesIO()
-        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-            df.to_excel(writer, index=False, sheet_name="Sheet1")
-        st.download_button("📘 Download Excel (.xlsx)", data=buffer.getvalue(),
-                           file_name=f"{filename_base}.xlsx",
-                           mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    with tracer.span("download_button_for_df") as span:
+        span.touch(df)
+        _download_buttons(df, filename_base)
+
+def _download_buttons(df: pd.DataFrame, filename_base: str):
+    # exports are only built on request and reused until the data version changes; the
+    # download button (which reads and hashes the whole file) is only sent in the run
+    # that built the file or asked for it again, not on every rerun
+    exports = st.session_state.exports
+    version = st.session_state.store.version
+    cols = st.columns(len(FORMATS))
+    for col, (fmt, (ext, mime, label)) in zip(cols, FORMATS.items()):
+        with col:
+            path = exports.get(version, fmt)
+            if path is not None and not st.button(f"{ext} ready: get link", key=f"ready_{fmt}"):
+                continue
+            if path is None:
+                if st.button(f"Prepare {ext}", key=f"prepare_{fmt}"):
+                    try:
+                        with st.spinner(f"Building {ext}..."):
+                            if len(st.session_state.plan):
+                                df = materialize()
+                                version = st.session_state.store.version
+                            with tracer.span(f"export {ext}") as span:
+                                path = exports.build(df, version, fmt)
+                                span.touch(df, bytes=os.path.getsize(path))
+                    except Exception as e:
+                        st.error(f"Export failed: {e}")
+            if path is not None:
+                with open(path, "rb") as fh:
+                    st.download_button(label, data=fh, file_name=f"{filename_base}.{ext}",
+                                       mime=mime, key=f"download_{fmt}")
 
 # ----------------------------
 # Ribbon Tabs (Excel-like)
 # ----------------------------
 st.title("🧩 Data-Analyzer by Tawseef")
 
+# Undo / Redo bar and operation plan: placeholders filled in at the end of the script,
+# once this rerun's actions have been recorded
+history_box = st.container()
+plan_box = st.expander("🧾 Operation plan / lazy mode")
+
+
 excel_tabs = st.tabs(["🏠 Home", "📊 Data", "🔎 View", "📚 Group", "💾 File & Save"])
 
 # =========================================================
@@ -103,58 +443,129 @@ with excel_tabs[4]:
 
     with cfile1:
         st.markdown("#### Open")
-        uploaded = st.file_uploader("Open .csv / .xlsx / .json", type=["csv", "xlsx", "json"])
-        if uploaded is not None:
-            name = uploaded.name.lower()
+        uploaded = st.file_uploader("Open .csv / .xlsx / .xls / .json", type=["csv", "xlsx", "xls", "json"])
+        stream_mode = st.checkbox("Stream CSV in chunks (large files: downcasts numbers, "
+                                  "low-cardinality text becomes categories)")
+        st.checkbox("Optimize memory on load (smaller number types, categories, Arrow strings)",
+                    key="optimize_on_load")
+        server_path = ""
+        if stream_mode and SERVER_DATA_DIR:
+            server_path = st.text_input(f"…or stream a CSV from the server folder {SERVER_DATA_DIR}",
+                                        value="", placeholder="e.g. 2024/monthly.csv").strip()
+        if server_path:
+            try:
+                server_path = server_data_path(server_path)
+                stat = os.stat(server_path)
+                key = cache_key(f"{os.path.abspath(server_path)}:{stat.st_mtime_ns}:{stat.st_size}",
+                                "csv", {"stream": True})
+                if source_changed("server", key):
+                    df, cached = load_streamed(server_path, key, stat.st_size)
+                    activate_loaded(key, df, os.path.basename(server_path), cached, "server")
+            except Exception as e:
+                st.error(f"Error loading file: {e}")
+        elif uploaded is not None:
             try:
-                if name.endswith(".csv"):
-                    df = pd.read_csv(uploaded)
-                elif name.endswith(".xlsx"):
-                    df = pd.read_excel(uploaded)
-                elif name.endswith(".json"):
-                    df = pd.read_json(uploaded)
+                if stream_mode and uploaded.name.lower().endswith(".csv"):
+                    key = cache_key(upload_digest(uploaded), "csv", {"stream": True})
+                    if source_changed("upload", key):
+                        uploaded.seek(0)
+                        df, cached = load_streamed(uploaded, key, uploaded.size)
+                        activate_loaded(key, df, uploaded.name, cached, "upload")
                 else:
-                    st.error("Unsupported file type.")
-                    df = None
-                if df is not None:
-                    set_df(df)
-                    st.session_state.loaded_name = uploaded.name
-                    st.success("File loaded successfully....")
+                    kind = file_kind(uploaded.name)
+                    options = excel_options(uploaded, kind) if kind in ("xlsx", "xls") else None
+                    key = cache_key(upload_digest(uploaded), kind, options)
+                    if source_changed("upload", key):
+                        with tracer.span(f"load: {kind}") as span:
+                            key, df, cached = get_ingest_cache().load(uploaded.getvalue(), uploaded.name, options,
+                                                                      digest=upload_digest(uploaded))
+                            span.touch(df, bytes=uploaded.size, cached=cached)
+                        activate_loaded(key, df, uploaded.name, cached, "upload")
             except Exception as e:
                 st.error(f"Error loading file: {e}")
+        if not server_path:
+            st.session_state.source_keys.pop("server", None)
+        if uploaded is None:
+            # removing the file and adding it again opens it again
+            st.session_state.source_keys.pop("upload", None)
+
+        with st.expander("Batch open: many files or a .zip into one dataset"):
+            batch = st.file_uploader("Files (.csv / .xlsx / .xls / .json / .zip)",
+                                     type=["csv", "xlsx", "xls", "json", "zip"], accept_multiple_files=True)
+            add_source = st.checkbox("Add a source_file column", value=True)
+            if batch and st.button("Load batch"):
+                try:
+                    key, df, cached = load_batch(batch, add_source)
+                    if df.empty:
+                        st.error("No file in the batch could be loaded.")
+                    else:
+                        activate_loaded(key, df, f"{len(batch)} files", cached, "batch")
+                except Exception as e:
+                    st.error(f"Error loading batch: {e}")
+            report = st.session_state.batch_report
+            if report is not None:
+                failed = report["error"].notna().sum()
+                st.caption(f"Last batch: {len(report) - failed} loaded, {failed} failed, "
+                           f"{report['seconds'].sum():.2f}s total parse time")
+                st.dataframe(report, use_container_width=True)
 
     with cfile2:
         st.markdown("#### Info")
         st.write("**Loaded:**", st.session_state.loaded_name or "—")
         if not st.session_state.df.empty:
             st.write("**Rows/Cols:**", st.session_state.df.shape)
+        cache = get_ingest_cache()
+        cache.trim()
+        meta = cache.meta(st.session_state.loaded_key)
+        if "disk_bytes" in meta:
+            st.write("**Streamed via:**", f"{meta['chunks']} temporary Parquet chunks "
+                                           f"({meta['disk_bytes'] / 1e6:.1f} MB, removed after loading)")
+        if "memory_bytes" in meta:
+            st.write("**In memory:**", f"{meta['memory_bytes'] / 1e6:.1f} MB")
+        st.caption(f"Shared datasets: {cache.used_bytes / 1e6:.1f} / {cache.budget_bytes / 1e6:.0f} MB in RAM "
+                   f"({cache.pinned_bytes / 1e6:.1f} MB in use by open sessions), "
+                   f"{cache.spilled_count} on disk, {cache.hits} hits, {cache.misses} misses, "
+                   f"{cache.reloads} reloads")
+        if not st.session_state.df.empty:
+            st.button("🪶 Optimize memory", on_click=optimize_memory,
+                      help="Downcast numbers, turn repetitive text into categories and other text "
+                           "into Arrow strings. Undo restores the original types.")
+        report = st.session_state.memory_report
+        if report is not None:
+            before, after = report["MB before"].sum(), report["MB after"].sum()
+            with st.expander(f"Memory: {before:.1f} MB → {after:.1f} MB"):
+                st.dataframe(report, use_container_width=True, hide_index=True)
 
     st.markdown("----")
     st.markdown("#### Save")
     if require_df():
         file_name = st.text_input("Enter your file name to save (no extension):", value="output")
-        if st.button("Save as CSV"):
-            try:
-                path = f"{file_name.strip()}.csv"
-                if os.path.exists(path):
-                    st.warning("File already exists.")
-                else:
-                    st.session_state.df.to_csv(path, index=False)
-                    st.success("File saved successfully....")
-            except Exception as e:
-                st.error(f"Save failed: {e}")
-
-        if st.button("Save as Excel (.xlsx)"):
-            try:
-                path = f"{file_name.strip()}.xlsx"
-                if os.path.exists(path):
-                    st.warning("File already exists.")
-                else:
-                    with pd.ExcelWriter(path, engine="openpyxl") as writer:
-                        st.session_state.df.to_excel(writer, index=False, sheet_name="Sheet1")
-                    st.success("File saved successfully....")
-            except Exception as e:
-                st.error(f"Save failed: {e}")
+        s1, s2 = st.columns(2)
+        with s1:
+            save_fmt = st.selectbox("Save as", list(FORMATS), format_func=lambda f: f".{FORMATS[f][0]}")
+        partition_cols = []
+        if save_fmt == "parquet":
+            with s2:
+                partition_cols = st.multiselect("Partition by (writes a folder, one sub-folder per value)",
+                                                list(st.session_state.df.columns))
+        if st.button("💾 Save in background"):
+            path = f"{file_name.strip()}.{FORMATS[save_fmt][0]}"
+            busy = any(job.running and job.path == path for job in st.session_state.save_jobs)
+            if os.path.exists(path) or busy:
+                st.warning("File already exists.")
+            else:
+                try:
+                    start_save(save_fmt, path, {"partition_cols": partition_cols} if partition_cols else {})
+                except Exception as e:
+                    st.error(f"Save failed: {e}")
+        if any(job.running for job in st.session_state.save_jobs):
+            if hasattr(st, "fragment"):
+                st.fragment(run_every=1.0)(show_save_jobs)()
+            else:
+                show_save_jobs()
+                st.button("🔄 Refresh progress")
+        else:
+            show_save_jobs()
 
         # Instant download (doesn't write to server disk)
         st.caption("Or download directly without saving on server disk:")
@@ -181,16 +592,15 @@ with excel_tabs[0]:
         ends_with = st.number_input("Enter the ending Row number", min_value=0, value=10, step=1)
 
     if require_df():
-        x = st.session_state.df.iloc[int(starts_with):int(ends_with)]
         if st.button("Apply View/Change"):
             if view_mode.startswith("1."):
                 # modify actual df to the slice
-                set_df(x)
-                st.success(f"From row {starts_with} to {ends_with} data is now the active data.")
-                st.dataframe(st.session_state.df, use_container_width=True)
+                if run_op({"op": "slice", "start": int(starts_with), "stop": int(ends_with)}):
+                    st.success(f"From row {starts_with} to {ends_with} data is now the active data.")
+                    st.dataframe(st.session_state.df, use_container_width=True)
             else:
                 st.info(f"From row {starts_with} to {ends_with} data preview:")
-                st.dataframe(x, use_container_width=True)
+                show_head(max(int(ends_with) - int(starts_with), 0), int(starts_with))
 
     st.markdown("hr", unsafe_allow_html=True)
 
@@ -208,29 +618,56 @@ with excel_tabs[0]:
             replacing = st.number_input("Enter a value to replace (int)", step=1, value=0)
             replace_with = st.number_input("Enter the replacing value (int)", step=1, value=0)
             if st.button("Replace (int→int)"):
-                set_df(st.session_state.df.replace(to_replace=int(replacing), value=int(replace_with)))
-                st.success("Replacement done.")
+                if run_op({"op": "replace", "mapping": [[int(replacing), int(replace_with)]]}):
+                    st.success("Replacement done.")
         elif case1 == "y" and case2 == "n":
             replacing = st.number_input("Enter a value to replace (int)", step=1, value=0)
             replace_with = st.text_input("Enter the replacing value (str)", value="")
             if st.button("Replace (int→str)"):
-                set_df(st.session_state.df.replace(to_replace=int(replacing), value=replace_with))
-                st.success("Replacement done.")
+                if run_op({"op": "replace", "mapping": [[int(replacing), replace_with]]}):
+                    st.success("Replacement done.")
         elif case1 == "n" and case2 == "y":
             replacing = st.text_input("Enter a value to replace (str)", value="")
             replace_with = st.number_input("Enter the replacing value (int)", step=1, value=0)
             if st.button("Replace (str→int)"):
-                set_df(st.session_state.df.replace(to_replace=replacing, value=int(replace_with)))
-                st.success("Replacement done.")
+                if run_op({"op": "replace", "mapping": [[replacing, int(replace_with)]]}):
+                    st.success("Replacement done.")
         elif case1 == "n" and case2 == "n":
             replacing = st.text_input("Enter a value to replace (str)", value="")
             replace_with = st.text_input("Enter the replacing value (str)", value="")
             if st.button("Replace (str→str)"):
-                set_df(st.session_state.df.replace(to_replace=replacing, value=replace_with))
-                st.success("Replacement done.")
+                if run_op({"op": "replace", "mapping": [[replacing, replace_with]]}):
+                    st.success("Replacement done.")
+
+        with st.expander("Bulk replace with a mapping table"):
+            st.caption("One row per value to find. Write `<null>` for a missing value. "
+                       "All pairs are applied in one pass per column.")
+            table_file = st.file_uploader("Upload a mapping (.csv: find, replace with)", type=["csv"],
+                                          key="replace_upload")
+            if table_file is not None:
+                mapping_table = pd.read_csv(table_file, dtype=str, keep_default_na=False)
+                st.dataframe(mapping_table.head(20), use_container_width=True)
+            else:
+                mapping_table = st.data_editor(pd.DataFrame({"find": [""], "replace with": [""]}),
+                                               num_rows="dynamic", use_container_width=True, key="replace_table")
+            scope = st.multiselect("Only in these columns (blank = all)", list(st.session_state.df.columns))
+            m1, m2, m3 = st.columns(3)
+            with m1:
+                parse_numbers = st.checkbox("Numeric-looking text is a number", value=True)
+            with m2:
+                match_types = st.checkbox("Match types strictly (\"1\" ≠ 1)", value=True)
+            with m3:
+                use_regex = st.checkbox("Find values are regular expressions", value=False)
+            if st.button("Apply mapping"):
+                mapping = mapping_from_table(mapping_table, parse_numbers and not use_regex)
+                if not mapping:
+                    st.warning("The mapping table is empty.")
+                elif run_op({"op": "replace", "mapping": mapping, "columns": scope or None,
+                             "regex": use_regex, "match_types": match_types}):
+                    st.success(f"Replaced {len(mapping)} value(s).")
 
         if not st.session_state.df.empty:
-            st.dataframe(st.session_state.df.head(10), use_container_width=True)
+            show_head(10)
 
     st.markdown("hr", unsafe_allow_html=True)
 
@@ -238,15 +675,36 @@ with excel_tabs[0]:
     st.markdown('<div class="group-title">Sort</div>', unsafe_allow_html=True)
     if require_df():
         cols = list(st.session_state.df.columns)
-        col_idx = st.selectbox("Enter the column index", options=list(range(len(cols))),
-                               format_func=lambda i: f"{i}. {cols[i]}")
-        choose_method = st.selectbox("Choose the operation", ["1. Sort in ascending", "2. Sort in descending"], index=0)
-        if st.button("Apply Sort"):
-            column = cols[col_idx]
-            ascending = True if choose_method.startswith("1.") else False
-            set_df(st.session_state.df.sort_values(by=column, ascending=ascending))
-            st.success("Sorted.")
-            st.dataframe(st.session_state.df.head(10), use_container_width=True)
+        sort_by = st.multiselect("Sort by (in priority order)", cols, default=cols[:1])
+        directions = []
+        if sort_by:
+            dcols = st.columns(len(sort_by))
+            for dcol, column in zip(dcols, sort_by):
+                with dcol:
+                    choose_method = st.selectbox(f"{column}", ["1. Sort in ascending", "2. Sort in descending"],
+                                                 index=0, key=f"sort_dir_{column}")
+                    directions.append(choose_method.startswith("1."))
+        if st.button("Apply Sort") and sort_by:
+            if run_op({"op": "sort", "by": sort_by, "ascending": directions}):
+                st.success("Sorted.")
+                st.dataframe(st.session_state.df.head(10), use_container_width=True)
+
+        st.markdown('<div class="group-title">Top / Bottom N</div>', unsafe_allow_html=True)
+        t1, t2, t3 = st.columns([1.2, 0.8, 0.8])
+        with t1:
+            top_col = st.selectbox("Rank by column", cols, key="top_col")
+        with t2:
+            top_count = st.number_input("N", min_value=1, value=10, step=1, key="top_n")
+        with t3:
+            top_which = st.selectbox("Which", ["Largest", "Smallest"], key="top_which")
+        if st.button("Show Top/Bottom N"):
+            try:
+                df = materialize()
+                st.dataframe(top_n(df, top_col, int(top_count), top_which == "Largest",
+                                   st.session_state.group_keys, st.session_state.store.version),
+                             use_container_width=True)
+            except Exception as e:
+                st.error(f"Error: {e}")
 
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -282,20 +740,22 @@ with excel_tabs[1]:
             if fill_choice.startswith("1."):
                 fill_value = st.text_input("Enter the value", value="")
                 if st.button("Apply Custom Fill"):
-                    set_df(st.session_state.df.fillna(fill_value))
-                    st.success("Nulls filled.")
-                    st.dataframe(st.session_state.df.head(10), use_container_width=True)
+                    if run_op({"op": "fillna", "value": fill_value}):
+                        st.success("Nulls filled.")
+                        st.dataframe(st.session_state.df.head(10), use_container_width=True)
 
             elif fill_choice.startswith("2."):
                 ccols = list(st.session_state.df.columns)
                 col_sel = st.selectbox("Select a numeric column", ccols)
                 if st.button("Fill with Average"):
                     try:
-                        avg = st.session_state.df[col_sel].mean()
-                        set_df(st.session_state.df.fillna({col_sel: avg}))
-                        st.info(f"Null values filled with : {avg}")
-                        st.write(st.session_state.df.isnull().sum())
-                        st.dataframe(st.session_state.df.head(10), use_container_width=True)
+                        op = {"op": "fill_stat", "column": col_sel, "stat": "mean"}
+                        if not st.session_state.get("lazy"):
+                            op["value"] = fill_value(col_sel, "mean")
+                        if run_op(op):
+                            st.info(f"Null values filled with : {op['value']}")
+                            st.write(null_counts())
+                            st.dataframe(st.session_state.df.head(10), use_container_width=True)
                     except Exception:
                         st.error(f"{col_sel} isn't numeric, please select a numeric column")
 
@@ -304,11 +764,13 @@ with excel_tabs[1]:
                 col_sel = st.selectbox("Select a numeric column", ccols)
                 if st.button("Fill with Sum"):
                     try:
-                        col_sum = st.session_state.df[col_sel].sum()
-                        set_df(st.session_state.df.fillna({col_sel: col_sum}))
-                        st.info(f"Null values filled with : {col_sum}")
-                        st.write(st.session_state.df.isnull().sum())
-                        st.dataframe(st.session_state.df.head(10), use_container_width=True)
+                        op = {"op": "fill_stat", "column": col_sel, "stat": "sum"}
+                        if not st.session_state.get("lazy"):
+                            op["value"] = fill_value(col_sel, "sum")
+                        if run_op(op):
+                            st.info(f"Null values filled with : {op['value']}")
+                            st.write(null_counts())
+                            st.dataframe(st.session_state.df.head(10), use_container_width=True)
                     except Exception:
                         st.error(f"{col_sel} isn't numeric, please select a numeric column")
 
@@ -316,26 +778,24 @@ with excel_tabs[1]:
                 ccols = list(st.session_state.df.columns)
                 col_sel = st.selectbox("Enter the column name", ccols)
                 if st.button("Interpolate Column"):
-                    df_new = st.session_state.df.copy()
-                    df_new[col_sel] = df_new[col_sel].interpolate()
-                    set_df(df_new)
-                    st.success("Null values filled successfully....")
-                    st.write(st.session_state.df.isnull().sum())
-                    st.dataframe(st.session_state.df.head(10), use_container_width=True)
+                    if run_op({"op": "interpolate", "column": col_sel}):
+                        st.success("Null values filled successfully....")
+                        st.write(null_counts())
+                        st.dataframe(st.session_state.df.head(10), use_container_width=True)
 
             elif fill_choice.startswith("5."):
                 if st.button("Fill with previous row (ffill)"):
-                    set_df(st.session_state.df.ffill())
-                    st.success("Null values filled successfully....")
-                    st.write(st.session_state.df.isnull().sum())
-                    st.dataframe(st.session_state.df.head(10), use_container_width=True)
+                    if run_op({"op": "ffill"}):
+                        st.success("Null values filled successfully....")
+                        st.write(null_counts())
+                        st.dataframe(st.session_state.df.head(10), use_container_width=True)
 
             elif fill_choice.startswith("6."):
                 if st.button("Fill with Next row (bfill)"):
-                    set_df(st.session_state.df.bfill())
-                    st.success("Null values filled successfully....")
-                    st.write(st.session_state.df.isnull().sum())
-                    st.dataframe(st.session_state.df.head(10), use_container_width=True)
+                    if run_op({"op": "bfill"}):
+                        st.success("Null values filled successfully....")
+                        st.write(null_counts())
+                        st.dataframe(st.session_state.df.head(10), use_container_width=True)
 
         elif null_choice.startswith("2."):
             st.markdown("**Delete Null Columns**")
@@ -345,14 +805,14 @@ with excel_tabs[1]:
             if dopt.startswith("1."):
                 count_nan = st.number_input("Enter the maximum NaN value (thresh for non-NaN)", min_value=0, value=1)
                 if st.button("Apply (Columns with at least N non-NaN)"):
-                    set_df(st.session_state.df.dropna(axis=1, thresh=int(count_nan)))
-                    st.success(f"Columns filtered by thresh={int(count_nan)}")
-                    st.dataframe(st.session_state.df.head(10), use_container_width=True)
+                    if run_op({"op": "dropna", "axis": 1, "thresh": int(count_nan)}):
+                        st.success(f"Columns filtered by thresh={int(count_nan)}")
+                        st.dataframe(st.session_state.df.head(10), use_container_width=True)
             else:
                 if st.button("Delete columns that contain any NaN"):
-                    set_df(st.session_state.df.dropna(axis=1))
-                    st.success("Columns containing Null Deleted successfully.....")
-                    st.dataframe(st.session_state.df.head(10), use_container_width=True)
+                    if run_op({"op": "dropna", "axis": 1}):
+                        st.success("Columns containing Null Deleted successfully.....")
+                        st.dataframe(st.session_state.df.head(10), use_container_width=True)
 
         elif null_choice.startswith("3."):
             st.markdown("**Delete Null Rows**")
@@ -362,14 +822,14 @@ with excel_tabs[1]:
             if dopt.startswith("1."):
                 count_nan = st.number_input("Enter the maximum NaN value (thresh for non-NaN)", min_value=0, value=1)
                 if st.button("Apply (Rows with at least N non-NaN)"):
-                    set_df(st.session_state.df.dropna(axis=0, thresh=int(count_nan)))
-                    st.success(f"Rows filtered by thresh={int(count_nan)}")
-                    st.dataframe(st.session_state.df.head(10), use_container_width=True)
+                    if run_op({"op": "dropna", "axis": 0, "thresh": int(count_nan)}):
+                        st.success(f"Rows filtered by thresh={int(count_nan)}")
+                        st.dataframe(st.session_state.df.head(10), use_container_width=True)
             else:
                 if st.button("Delete rows that contain any NaN"):
-                    set_df(st.session_state.df.dropna(axis=0))
-                    st.success("Rows containing Null Deleted successfully.....")
-                    st.dataframe(st.session_state.df.head(10), use_container_width=True)
+                    if run_op({"op": "dropna", "axis": 0}):
+                        st.success("Rows containing Null Deleted successfully.....")
+                        st.dataframe(st.session_state.df.head(10), use_container_width=True)
 
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -380,12 +840,44 @@ with excel_tabs[2]:
     st.subheader("View")
     st.markdown('<div class="ribbon">', unsafe_allow_html=True)
     if require_df():
-        st.markdown('<div class="group-title">Worksheet</div>', unsafe_allow_html=True)
-        st.caption("Edit cells inline like Excel. Changes apply to the active DataFrame when you click **Apply Edits**.")
-        edited = st.data_editor(st.session_state.df, use_container_width=True, num_rows="dynamic")
-        if st.button("Apply Edits"):
-            set_df(edited)
-            st.success("Changes applied.")
+        if len(st.session_state.plan):
+            st.info(f"{len(st.session_state.plan)} pending step(s) in the operation plan. Run it to edit the grid.")
+            st.button("▶ Run plan", on_click=run_plan, key="run_plan_view")
+        else:
+            st.markdown('<div class="group-title">Worksheet</div>', unsafe_allow_html=True)
+            st.caption("Edit cells inline like Excel. Only the current page is sent to the browser; "
+                       "changes apply to the active DataFrame when you click **Apply Edits**.")
+            gcols = list(st.session_state.df.columns)
+            g1, g2, g3, g4 = st.columns([1.2, 1.2, 1.2, 0.8])
+            with g1:
+                filter_col = st.selectbox("Filter column", [None] + gcols,
+                                          format_func=lambda c: "—" if c is None else str(c))
+            with g2:
+                filter_text = st.text_input("contains", value="", disabled=filter_col is None)
+            with g3:
+                sort_col = st.selectbox("Sort view by", [None] + gcols,
+                                        format_func=lambda c: "—" if c is None else str(c))
+            with g4:
+                sort_asc = st.selectbox("Order", ["Ascending", "Descending"]) == "Ascending"
+            try:
+                positions = grid_positions(filter_col, filter_text.strip(), sort_col, sort_asc)
+            except Exception as e:
+                st.error(f"Can't sort/filter the view that way: {e}")
+                positions = grid_positions(None, "", None, True)
+
+            p1, p2 = st.columns([1, 3])
+            with p1:
+                page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1)
+            pages = max(1, -(-len(positions) // page_size))
+            with p2:
+                page = st.number_input(f"Page (1–{pages})", min_value=1, max_value=pages, value=1, step=1) - 1
+            page_df, start = window(st.session_state.df, positions, int(page), page_size)
+            st.caption(f"Rows {start + 1 if len(page_df) else 0}–{start + len(page_df)} of {len(positions):,} "
+                       f"(of {len(st.session_state.df):,} total). Apply edits before changing page.")
+
+            editor_key = f"grid_{st.session_state.store.version}_{hash((filter_col, filter_text, sort_col, sort_asc, page, page_size))}"
+            st.data_editor(page_df, use_container_width=True, num_rows="dynamic", key=editor_key)
+            st.button("Apply Edits", on_click=apply_grid_edits, args=(editor_key, positions, start))
     st.markdown('</div>', unsafe_allow_html=True)
 
 # =========================================================
@@ -396,43 +888,41 @@ with excel_tabs[3]:
     st.markdown('<div class="ribbon">', unsafe_allow_html=True)
     if require_df():
         st.markdown('<div class="group-title">Group By</div>', unsafe_allow_html=True)
-        st.write(st.session_state.df.head(10))
-
-        choice = st.selectbox(
-            "Select your choice",
-            [
-                "1. Sum of Column X Grouped by Y",
-                "2. count of Column X Grouped by Y",
-                "3. Mean of Column X Grouped by Y",
-                "4. Max of Column X Grouped by Y",
-                "5. Min of Column X Grouped by Y",
-            ],
-            index=0
-        )
-        group_con = st.selectbox("Enter the grouping value (column)", list(st.session_state.df.columns))
-        col_choose = st.selectbox("Enter the column name", list(st.session_state.df.columns))
-
-        df1 = None
+        show_head(10)
+
+        gcols = list(st.session_state.df.columns)
+        g1, g2, g3 = st.columns(3)
+        with g1:
+            group_cons = st.multiselect("Group by (one or more columns)", gcols, default=gcols[:1])
+        with g2:
+            value_cols = st.multiselect("Value columns", gcols, default=gcols[-1:])
+        with g3:
+            aggs = st.multiselect("Aggregations", AGGS, default=["sum"])
+        output = st.radio("Output", ["Table", "Pivot table"], horizontal=True)
+        pivot_col = None
+        if output == "Pivot table":
+            pivot_col = st.selectbox("Spread this group column across the pivot columns", group_cons or [None])
+
         if st.button("Run Group By"):
             try:
-                if choice.startswith("1."):
-                    df1 = st.session_state.df.groupby(group_con)[col_choose].sum()
-                elif choice.startswith("2."):
-                    df1 = st.session_state.df.groupby(group_con)[col_choose].count()
-                elif choice.startswith("3."):
-                    df1 = st.session_state.df.groupby(group_con)[col_choose].mean()
-                elif choice.startswith("4."):
-                    df1 = st.session_state.df.groupby(group_con)[col_choose].max()
-                elif choice.startswith("5."):
-                    df1 = st.session_state.df.groupby(group_con)[col_choose].min()
-                else:
-                    st.warning("Invalid choice")
-                if df1 is not None:
-                    st.success("Data Preview")
-                    # turn Series → DataFrame for display
-                    if isinstance(df1, pd.Series):
-                        df1 = df1.to_frame(name="value")
-                    st.dataframe(df1.head(10), use_container_width=True)
+                df = materialize()
+                version = st.session_state.store.version
+                cache = st.session_state.group_keys
+                with tracer.span(f"group-by ({output.lower()})") as span:
+                    span.touch(df)
+                    if output == "Pivot table":
+                        if len(value_cols) != 1 or len(aggs) != 1:
+                            raise ValueError("A pivot table needs exactly one value column and one aggregation.")
+                        rows = [c for c in group_cons if c != pivot_col]
+                        if not rows:
+                            raise ValueError("Pick at least two group columns: rows and the pivot column.")
+                        df1 = pivot(df, rows, pivot_col, value_cols[0], aggs[0], cache, version)
+                    else:
+                        df1 = group_aggregate(df, group_cons, [(c, a) for c in value_cols for a in aggs],
+                                              cache, version)
+                    span.touch(groups=len(df1))
+                st.success(f"Data Preview ({len(df1):,} groups)")
+                st.dataframe(df1.head(1000), use_container_width=True)
             except Exception as e:
                 st.error(f"Error: {e}")
 
@@ -441,14 +931,89 @@ with excel_tabs[3]:
 # =========================================================
 # FOOTER/STATUS
 # =========================================================
-with st.expander("Status / Data Summary"):
+with st.expander("Status / Data Summary"), tracer.span("footer summary") as footer_span:
     if not st.session_state.df.empty:
+        footer_span.touch(st.session_state.df)
         st.write("**Shape:**", st.session_state.df.shape)
         st.write("**Columns:**", list(st.session_state.df.columns))
         st.write("**Nulls per column:**")
-        st.write(st.session_state.df.isnull().sum())
+        st.write(null_counts())
+        if st.checkbox("Show column profile"):
+            st.dataframe(st.session_state.stats.frame(st.session_state.df, st.session_state.store.version),
+                         use_container_width=True)
+            st.caption("From the statistics cache (distinct counts are HyperLogLog estimates).")
+        if len(st.session_state.plan):
+            st.caption(f"Not including {len(st.session_state.plan)} pending step(s) of the operation plan.")
     else:
         st.info("No data loaded yet. Use **File & Save → Open**.")
 
+# =========================================================
+# UNDO / REDO BAR (container created under the title)
+# =========================================================
+with history_box:
+    store = st.session_state.store
+    u1, u2, u3 = st.columns([0.6, 0.6, 4])
+    with u1:
+        st.button("↶ Undo", on_click=undo_df, disabled=not store.can_undo)
+    with u2:
+        st.button("↷ Redo", on_click=redo_df, disabled=not store.can_redo)
+    with u3:
+        labels, pos = store.history()
+        st.caption(f"History: {' → '.join(labels[max(0, pos - 3):pos + 1])} "
+                   f"({pos} undo, {len(labels) - pos - 1} redo, {store.memory_bytes() / 1e6:.1f} MB in RAM, "
+                   f"{store.spilled_count()} on disk)")
 
+# =========================================================
+# OPERATION PLAN (expander created under the title)
+# =========================================================
+with plan_box:
+    st.caption(f"{len(st.session_state.plan)} pending step(s)")
+    st.checkbox("Lazy mode: record Home/Data actions and run them only when the data is needed", key="lazy")
+    plan = st.session_state.plan
+    if len(plan):
+        p1, p2 = st.columns(2)
+        with p1:
+            st.markdown("**Recorded**")
+            st.write([describe(op) for op in plan.steps])
+        with p2:
+            st.markdown("**Will run as**")
+            st.write([describe(op) for op in plan.optimized()])
+        b1, b2 = st.columns(2)
+        with b1:
+            st.button("▶ Run plan", on_click=run_plan)
+        with b2:
+            st.button("✖ Discard plan", on_click=plan.clear)
+    last = st.session_state.last_plan
+    if len(last):
+        st.caption("Last executed plan: " + " → ".join(describe(op) for op in last.steps))
+        st.button("↻ Replay last plan on current data", on_click=replay_plan, args=(last,))
+        st.download_button("Download plan (.json)", data=last.to_json(), file_name="plan.json",
+                           mime="application/json")
+    plan_file = st.file_uploader("Replay a saved plan (.json)", type=["json"], key="plan_upload")
+    if plan_file is not None and st.button("Replay uploaded plan"):
+        try:
+            replay_plan(Plan.from_json(plan_file.getvalue()))
+            st.success("Plan replayed." if not st.session_state.get("lazy") else "Plan queued.")
+        except Exception as e:
+            st.error(f"Invalid plan: {e}")
 
+# =========================================================
+# DIAGNOSTICS (per-step timings, exportable trace)
+# =========================================================
+rerun_span.touch(st.session_state.df)
+rerun_span.__exit__(None, None, None)
+with st.expander("⏱ Diagnostics"):
+    st.checkbox("Record timings and memory for every step and rerun", key="tracing")
+    if len(tracer):
+        st.caption(f"{len(tracer)} step(s) over {tracer.run} rerun(s); memory is the process RSS change "
+                   f"(peak = growth of the high-water mark).")
+        st.dataframe(tracer.frame(), use_container_width=True, hide_index=True)
+        d1, d2 = st.columns(2)
+        with d1:
+            st.download_button("Download trace (.json)", data=tracer.to_json(), file_name="trace.json",
+                               mime="application/json")
+            st.caption("Opens in chrome://tracing or ui.perfetto.dev.")
+        with d2:
+            st.button("Clear trace", on_click=tracer.clear)
+    elif not tracer.enabled:
+        st.caption("Off: no timings are recorded.")
@@ -0,0 +1,255 @@
+# ----------------------------
+# Benchmark suite for every tab operation
+# ----------------------------
+# Times each operation the app exposes on synthetic data and records peak
+# memory to a JSON file: tracemalloc (numpy/pandas/python allocations) plus the
+# high-water mark of pyarrow's memory pool, which tracemalloc can't see
+# (Parquet/Feather/streamed CSV work happens there).
+#
+#   python -m benchmarks.run_benchmarks --sizes 100000 1000000 10000000 --out bench.json
+#   python -m benchmarks.run_benchmarks --sizes 100000 --only sort --compare bench.json
+import argparse
+import fnmatch
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from analyzer.engine import Plan, apply_op, run_steps
+from analyzer.export import FORMATS, write_export
+from analyzer.grouping import AGGS, GroupKeyCache, group_aggregate
+from analyzer.ingest import parse_bytes, stream_csv
+from analyzer.sorting import SortCache
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow is optional for the app too
+    pa = None
+
+DEFAULT_SIZES = [100_000, 1_000_000, 10_000_000]
+
+
+def make_dataset(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Numeric, string, categorical and null-heavy columns."""
+    rng = np.random.default_rng(seed)
+    cities = np.array([f"city_{i:02d}" for i in range(50)])
+    df = pd.DataFrame({
+        "id": np.arange(rows, dtype=np.int64),
+        "price": rng.gamma(2.0, 50.0, rows).round(2),
+        "qty": rng.integers(0, 1000, rows),
+        "city": pd.Categorical(cities[rng.integers(0, len(cities), rows)]),
+        "status": rng.choice(["new", "open", "closed", "N/A"], rows),
+        "name": pd.Series(rng.integers(0, rows, rows)).map("user_{}".format),
+        "sparse": np.where(rng.random(rows) < 0.8, np.nan, rng.random(rows)),
+        "day": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+    })
+    df.loc[rng.random(rows) < 0.1, "price"] = np.nan
+    return df
+
+
+class ArrowPeak:
+    """Samples pyarrow's allocated bytes on a thread; peak is the rise over the start."""
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if pa is not None:
+            self._base = pa.total_allocated_bytes()
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._take()
+
+    def _take(self):
+        self.peak = max(self.peak, pa.total_allocated_bytes() - self._base)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._take()
+
+
+def measure(fn, memory=True):
+    """Wall time from an untraced run, then peak bytes from a traced one.
+
+    The peak adds tracemalloc's and the Arrow pool's, so it is an upper bound
+    when both allocate during the same call.
+    """
+    gc.collect()
+    started = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        return time.perf_counter() - started, None, f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - started
+    if not memory:
+        return seconds, None, None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with ArrowPeak() as arrow:
+            fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak + arrow.peak, None
+
+
+def cases(df: pd.DataFrame, blobs: dict, workdir: str, xlsx_rows: int):
+    """(group, name, callable) for every operation."""
+    out = []
+    for kind, data in blobs.items():
+        out.append(("load", kind, lambda d=data, k=kind: parse_bytes(d, k)))
+    if "csv" in blobs:
+        out.append(("load", "csv stream", lambda: stream_csv(io.BytesIO(blobs["csv"]),
+                                                                 os.path.join(workdir, "stream"))))
+    for fmt in FORMATS:
+        if fmt == "xlsx" and len(df) > xlsx_rows:
+            continue
+        out.append(("serialize", fmt, lambda f=fmt: write_export(df, f, os.path.join(workdir, f"out.{f}"))))
+
+    out.append(("replace", "single value", lambda: apply_op(df, {"op": "replace", "mapping": [["N/A", None]]})))
+    mapping = [[f"city_{i:02d}", f"CITY_{i:02d}"] for i in range(25)] + [["N/A", None], [0, -1]]
+    out.append(("replace", "mapping x27", lambda: apply_op(df, {"op": "replace", "mapping": mapping})))
+    chain = [{"op": "replace", "mapping": [["N/A", "closed"]]},
+             {"op": "replace", "mapping": [["closed", "done"], ["new", "open"]]}]
+    out.append(("replace", "2 replaces one by one", lambda: run_steps(df, chain)))
+    out.append(("replace", "2 replaces fused", lambda: Plan(chain).execute(df)))
+    # fails the case (error column) if fusing changed the result
+    out.append(("replace", "2 replaces fused vs one by one", lambda: Plan(chain).verify(df)))
+
+    # Cold cases build their own caches so the traced second run stays cold.
+    sorter = SortCache()
+    sorter.sort(df, ["price"], True)
+    out.append(("sort", "price asc (cold)", lambda: SortCache().sort(df, ["price"], True)))
+    out.append(("sort", "price desc (reuses asc)", lambda: sorter.sort(df, ["price"], False)))
+    out.append(("sort", "city, qty desc (cold)", lambda: SortCache().sort(df, ["city", "qty"], [True, False])))
+    out.append(("sort", "pandas sort_values price", lambda: df.sort_values("price")))
+
+    out.append(("fill", "custom", lambda: apply_op(df, {"op": "fillna", "value": 0})))
+    for stat in ("mean", "sum"):
+        out.append(("fill", stat, lambda s=stat: apply_op(df, {"op": "fill_stat", "column": "price", "stat": s})))
+    out.append(("fill", "interpolate", lambda: apply_op(df, {"op": "interpolate", "column": "price"})))
+    out.append(("fill", "ffill", lambda: apply_op(df, {"op": "ffill"})))
+    out.append(("fill", "bfill", lambda: apply_op(df, {"op": "bfill"})))
+
+    for axis in (0, 1):
+        what = "rows" if axis == 0 else "columns"
+        out.append(("dropna", f"{what} any", lambda a=axis: apply_op(df, {"op": "dropna", "axis": a})))
+        for thresh in (1, df.shape[1] // 2, df.shape[1]) if axis == 0 else (1, len(df) // 2):
+            out.append(("dropna", f"{what} thresh={thresh}",
+                        lambda a=axis, t=thresh: apply_op(df, {"op": "dropna", "axis": a, "thresh": t})))
+
+    keys = GroupKeyCache()
+    keys.codes(df, "city")
+    out.append(("group", "factorize city (cold)", lambda: GroupKeyCache().codes(df, "city")))
+    for agg in AGGS:
+        out.append(("group", f"city: {agg}(price)", lambda a=agg: group_aggregate(df, ["city"], [("price", a)], keys)))
+    out.append(("group", "city, status: all aggs", lambda: group_aggregate(
+        df, ["city", "status"], [("price", a) for a in AGGS], keys)))
+    return out
+
+
+def serialize_inputs(df: pd.DataFrame, xlsx_rows: int, json_rows: int) -> dict:
+    blobs = {"csv": df.to_csv(index=False).encode("utf-8")}
+    if json_rows and len(df) <= json_rows:
+        blobs["json"] = df.to_json(orient="records", date_format="iso").encode("utf-8")
+    if xlsx_rows and len(df) <= xlsx_rows:
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False)
+        blobs["xlsx"] = buf.getvalue()
+    return blobs
+
+
+def run(sizes, only=None, xlsx_rows=200_000, json_rows=1_000_000, seed=0, memory=True, log=print):
+    results = []
+    for rows in sizes:
+        log(f"# {rows:,} rows: generating")
+        df = make_dataset(rows, seed)
+        blobs = serialize_inputs(df, xlsx_rows, json_rows)
+        with tempfile.TemporaryDirectory(prefix="analyzer-bench-") as workdir:
+            for group, name, fn in cases(df, blobs, workdir, xlsx_rows):
+                label = f"{group}/{name}"
+                if only and not any(fnmatch.fnmatch(label, f"*{p}*") for p in only):
+                    continue
+                seconds, peak, error = measure(fn, memory)
+                peak_mb = None if peak is None else round(peak / 1e6, 2)
+                results.append({"rows": rows, "group": group, "op": name, "seconds": round(seconds, 4),
+                                "peak_mb": peak_mb, "error": error})
+                log(f"{rows:>10,}  {label:<40} {seconds:9.3f}s  " +
+                    (f"{peak_mb:9.1f} MB" if peak_mb is not None else "        -") +
+                    (f"  ERROR {error}" if error else ""))
+        del df, blobs
+    return results
+
+
+def compare(results, baseline_path, log=print, threshold=1.2):
+    with open(baseline_path, encoding="utf-8") as fh:
+        base = {(r["rows"], r["group"], r["op"]): r for r in json.load(fh)["results"]}
+    regressions = 0
+    for r in results:
+        old = base.get((r["rows"], r["group"], r["op"]))
+        if not old or not old["seconds"]:
+            continue
+        ratio = r["seconds"] / old["seconds"]
+        if ratio > threshold:
+            regressions += 1
+            log(f"SLOWER x{ratio:.2f}  {r['rows']:,} {r['group']}/{r['op']}: "
+                f"{old['seconds']:.3f}s -> {r['seconds']:.3f}s")
+    log(f"{regressions} regression(s) over x{threshold}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run_benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="row counts to test")
+    parser.add_argument("--only", nargs="*", help="substring filters on group/op, e.g. sort fill/ffill")
+    parser.add_argument("--xlsx-max-rows", type=int, default=200_000,
+                        help="skip .xlsx load/serialize above this many rows (Excel is slow and capped at 1M)")
+    parser.add_argument("--json-max-rows", type=int, default=1_000_000,
+                        help="skip the .json load above this many rows (10M rows is a ~17 GB document)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the traced second run (halves the runtime, no peak_mb)")
+    parser.add_argument("--out", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="earlier results JSON to flag regressions against")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.only, args.xlsx_max_rows, args.json_max_rows, args.seed, not args.no_memory)
+    payload = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, indent=2)
+    print(f"wrote {len(results)} results to {args.out}")
+    if args.compare:
+        return 1 if compare(results, args.compare) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())